@@ -1,7 +1,9 @@
 from logging import getLogger
 from datetime import timedelta
+from threading import Event
 
 from redis import Redis
+from celery import Celery
 from flask import Flask
 from flask_cors import CORS
 from flask_caching import Cache
@@ -12,7 +14,8 @@ from werkzeug.contrib.fixers import ProxyFix
 
 from .utils import (
     json_in_body, jsonify_error, jsonify_jwt_error,
-    load_provider, load_controller, load_sentry, load_scout_apm)
+    load_provider, load_controller, load_sentry, load_scout_apm, load_metrics,
+    load_timing, load_json, load_revocation)
 
 
 __version__ = '0.1.5'
@@ -45,6 +48,17 @@ def create_app():
 
     app.wsgi_app = ProxyFix(app.wsgi_app)
     app.redis = Redis.from_url(app.config['REDIS_URL'])
+    app.celery = Celery('pushresume', broker=app.config['REDIS_URL'])
+    app.celery.conf.update(
+        task_default_queue=app.config['QUEUE_BULK'],
+        task_routes=app.config['TASK_ROUTES'])
+    load_revocation(app, jwt)
+
+    load_json(app)
+
+    app.ready = Event()  # set by warm-up, see gunicorn.conf.py
+    if not app.config['WARMUP']:
+        app.ready.set()
 
     app.before_request(json_in_body)
     app.register_error_handler(Exception, jsonify_error)
@@ -62,6 +76,12 @@ def create_app():
     if app.config['SCOUT_KEY']:
         load_scout_apm(app, db)
 
+    if app.config['METRICS']:
+        load_metrics(app)
+
+    if app.config['SERVER_TIMING']:
+        load_timing(app, cache)
+
     try:
         cache.clear()
     except Exception as e:
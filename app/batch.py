@@ -0,0 +1,118 @@
+from time import monotonic
+from contextlib import contextmanager
+from threading import Event, Thread
+from multiprocessing import get_context
+from concurrent.futures import (
+    ThreadPoolExecutor, ProcessPoolExecutor, as_completed)
+
+from . import db
+from .locks import Lease
+from .models import User, Resume
+from .tasks import current_app, default_result, pending, publish, refresh
+
+
+class Busy(Exception):
+    """Celery run of the same kind is alive"""
+
+
+@contextmanager
+def leased(kind, force=False):
+    """Holds the task lease of kind, so Celery runs skip meanwhile, and
+    refuses to start while one of them is alive, unless forced. Yields
+    an event set when the lease is lost, the run should stop then"""
+    redis, ttl = current_app.redis, current_app.config['TASK_LEASE_TTL']
+    logger = current_app.logger
+    lease = Lease(redis, f'task:{kind}', ttl)
+    acquired = lease.acquire()
+    alive = [] if acquired else [lease.key]
+    alive += [key.decode() for key in redis.scan_iter(f'{lease.key}:*')]
+    if alive and not force:
+        lease.release()
+        raise Busy(f'{kind} is running: {", ".join(sorted(alive))}')
+
+    stopped, lost = Event(), Event()
+
+    def renew():
+        while not stopped.wait(ttl / 3):
+            if not lease.renew():
+                logger.warning(f'One-shot {kind} stopped, lease lost: {lease}')
+                return lost.set()
+
+    if acquired:  # a forced run without it has nothing to renew
+        Thread(target=renew, daemon=True).start()
+    try:
+        yield lost
+    finally:
+        stopped.set()
+        lease.release()
+
+
+def select(kind, providers=(), shard=None):
+    """Ids of due resumes or users, shard is (index, total)"""
+    if kind == 'push':
+        query = pending().with_entities(Resume.id, User.provider)
+        key = Resume.slot
+    else:
+        query = User.query.filter(User.due()).with_entities(
+            User.id, User.provider)
+        key = User.id
+    if providers:
+        query = query.filter(User.provider.in_(providers))
+    if shard:
+        index, total = shard
+        query = query.filter(key % total == index)
+    return query.order_by(key).all()
+
+
+def work(kind, ids):
+    with current_app.app_context():
+        try:
+            if kind == 'push':
+                return publish(pending().filter(Resume.id.in_(ids)).all())
+            return refresh(User.query.filter(
+                User.id.in_(ids), User.due()).all())
+        finally:
+            db.session.remove()
+
+
+_inherited = []  # parent's pools, kept so their connections never close
+
+
+def detach():
+    """Forked workers open their own connections and leave the inherited
+    ones alone, closing those would end the parent's sessions"""
+    engine = db.engine
+    try:
+        engine.dispose(close=False)
+    except TypeError:  # SQLAlchemy before 1.4.33
+        _inherited.append(engine.pool)
+        engine.pool = engine.pool.recreate()
+
+
+def run(kind, ids, workers=4, processes=False, batch=100, stop=None):
+    """Runs push or reauth over ids on a pool, returns totals and rate,
+    chunks not started yet are dropped once stop is set"""
+    chunks = [ids[i:i + batch] for i in range(0, len(ids), batch)]
+    if processes:
+        pool = ProcessPoolExecutor(
+            workers, mp_context=get_context('fork'), initializer=detach)
+    else:
+        pool = ThreadPoolExecutor(workers)
+
+    result, started = default_result.copy(), monotonic()
+    with pool:
+        futures = [pool.submit(work, kind, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            for key, value in future.result().items():
+                result[key] += value
+            if stop is not None and stop.is_set():
+                for waiting in futures:
+                    waiting.cancel()
+
+    elapsed = monotonic() - started
+    result.update(
+        seconds=round(elapsed, 3),
+        rate=round(result['total'] / elapsed, 1) if elapsed else 0.0)
+    return result
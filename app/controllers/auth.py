@@ -2,12 +2,15 @@ from datetime import datetime, timedelta
 
 from flask import Blueprint, current_app, abort, request, jsonify
 from flask_jwt_extended import (
-    create_access_token, jwt_required, jwt_optional, get_jwt_identity)
+    create_access_token, jwt_required, jwt_optional, get_jwt_identity,
+    get_raw_jwt)
+from redis import RedisError
+from sqlalchemy.exc import SQLAlchemyError
 
 from .. import db
 from ..models import User
 from ..providers import ProviderError
-from ..utils import validation_required
+from ..utils import validation_required, rate_limited
 
 
 module = Blueprint('auth', __name__, url_prefix='/auth')
@@ -82,6 +85,7 @@ def redirect(provider_name):
 
 @module.route('/<provider_name>', methods=['POST'])
 @jwt_optional
+@rate_limited('RATELIMIT_LOGIN')
 @validation_required({'code': {'type': 'string', 'required': True}})
 def login(provider_name):
     """
@@ -117,6 +121,7 @@ def login(provider_name):
     :statuscode 200: OK
     :statuscode 400: invalid JSON in request's body
     :statuscode 401: auth errors
+    :statuscode 429: too many requests, see Retry-After
     :statuscode 500: unexpected errors
     :statuscode 503: provider errors
     """
@@ -129,27 +134,26 @@ def login(provider_name):
 
         code = request.get_json()['code']
         ids = provider.tokenize(code, refresh=False)
-        identity = provider.identity(ids['access_token'])
+        identity = provider.account(ids)
 
-        user = User.query.filter_by(
-            uniq=identity, provider=provider.name).first()
-        if not user:
-            user = User(uniq=identity, provider=provider.name)
-
-        user.access = ids['access_token']
-        user.refresh = ids['refresh_token']
-        user.expires = datetime.utcnow() + timedelta(seconds=ids['expires_in'])
-
-        db.session.add(user)
-        db.session.commit()
+        user_id = User.upsert(
+            uniq=identity, provider=provider.name,
+            access=ids['access_token'], refresh=ids['refresh_token'],
+            expires=datetime.utcnow() + timedelta(seconds=ids['expires_in']))
 
     except ProviderError as e:
         current_app.logger.error(f'Login error: {e}')
         return abort(503, 'Provider error')
 
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f'{type(e).__name__}: {e}', exc_info=1)
+        return abort(500, 'Database error')
+
     else:
-        current_app.logger.info(f'Logged in: {user}')
-        return jsonify(token=create_access_token(user.id))
+        current_app.logger.info(
+            f'Logged in: {identity}, provider={provider.name}')
+        return jsonify(token=create_access_token(user_id))
 
 
 @module.route('/refresh', methods=['GET'])
@@ -187,3 +191,50 @@ def refresh():
     user_id = get_jwt_identity()
     token = create_access_token(user_id)
     return jsonify(token=token)
+
+
+@module.route('/logout', methods=['POST'])
+@jwt_required
+def logout():
+    """
+    Revokes JWT token used to sign the request
+
+    .. :quickref: auth; Revoke JWT token (log-out)
+
+    **Request**:
+
+        .. sourcecode:: http
+
+            POST /auth/logout HTTP/1.1
+            Authorization: JWT q1w2.e3r4.t5y
+            Content-Type: application/json
+
+            {}
+
+    **Response**:
+
+        .. sourcecode:: http
+
+            HTTP/1.1 200 OK
+            Content-Type: application/json
+
+            {
+                "revoked": true
+            }
+
+    :reqheader Authorization: valid JWT token
+
+    :statuscode 200: OK
+    :statuscode 401: auth errors
+    :statuscode 500: unexpected errors
+    :statuscode 503: revocation store errors
+    """
+    token = get_raw_jwt()
+    try:
+        current_app.revoked.revoke(token['jti'], token['exp'])
+    except RedisError as e:
+        current_app.logger.error(f'Logout error: {e}')
+        return abort(503, 'Revocation store error')
+
+    current_app.logger.info(f'Logged out: user={get_jwt_identity()}')
+    return jsonify(revoked=True)
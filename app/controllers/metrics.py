@@ -0,0 +1,36 @@
+from hmac import compare_digest
+
+from flask import Blueprint, current_app, abort, request
+
+
+module = Blueprint('metrics', __name__)
+
+
+@module.route('/metrics', methods=['GET'])
+def main():
+    """
+    Prometheus metrics: provider latency, task timings, DB queries
+
+    .. :quickref: stats; Prometheus scrape endpoint
+
+    :reqheader Authorization: Bearer METRICS_TOKEN
+
+    :statuscode 200: OK
+    :statuscode 403: no or wrong token
+    :statuscode 404: metrics disabled
+    """
+    if not current_app.config['METRICS']:
+        return abort(404, 'Metrics disabled')
+
+    token = current_app.config['METRICS_TOKEN']
+    given = request.headers.get('Authorization', '').encode()
+    if not token or not compare_digest(given, f'Bearer {token}'.encode()):
+        return abort(403, 'Metrics token required')
+
+    try:
+        from ..metrics import exposition
+    except ImportError:
+        return abort(503, 'Metrics unavailable')
+
+    body, content_type = exposition()
+    return current_app.response_class(body, content_type=content_type)
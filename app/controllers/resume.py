@@ -1,3 +1,7 @@
+import json
+from time import monotonic
+from threading import BoundedSemaphore
+
 from flask import Blueprint, current_app, abort, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy.exc import SQLAlchemyError
@@ -5,14 +9,23 @@ from sqlalchemy.exc import SQLAlchemyError
 from .. import db
 from ..models import User, Resume
 from ..providers import ProviderError
-from ..utils import validation_required
+from ..utils import validation_required, conditional, rate_limited
+from ..utils import resume_version, bump_resume_version, enqueue
 
 
 module = Blueprint('resume', __name__)
 
 
+@module.record_once
+def setup(state):
+    state.app.events_waiters = BoundedSemaphore(
+        state.app.config['EVENTS_WAITERS'])
+
+
 @module.route('/resume', methods=['GET'])
 @jwt_required
+@conditional(lambda: resume_version(get_jwt_identity()))
+@rate_limited('RATELIMIT_RESUME')  # 304 revalidations don't count
 def resume():
     """
     User's resume list
@@ -45,9 +58,12 @@ def resume():
             ]
 
     :reqheader Authorization: valid JWT token
+    :reqheader If-None-Match: ETag of the previous response
 
     :statuscode 200: OK
+    :statuscode 304: not modified since the ETag in If-None-Match
     :statuscode 401: auth errors
+    :statuscode 429: too many requests, see Retry-After
     :statuscode 500: unexpected errors
     :statuscode 503: provider errors
     """
@@ -58,19 +74,27 @@ def resume():
         provider = current_app.providers[user.provider]
         resumes = provider.fetch(user.access)
 
-        for i in resumes:
-            resume = Resume.query.filter_by(uniq=i['uniq'], owner=user).first()
+        created = False
+        for record in resumes:
+            resume = Resume.query.filter_by(
+                uniq=record.uniq, owner=user).first()
             if not resume:
-                resume = Resume(uniq=i['uniq'], enabled=False, owner=user)
+                resume = Resume(uniq=record.uniq, enabled=False, owner=user)
                 current_app.logger.info(f'Resume created: {resume}')
                 db.session.add(resume)
+                created = True
 
-            i['enabled'] = resume.enabled
+            record.enabled = resume.enabled
 
         db.session.commit()
 
+        if created:
+            bump_resume_version(user.id)
+
     except ProviderError as e:
         current_app.logger.error(f'Resume error: {e}')
+        if e.status in (401, 403):
+            enqueue('reauth_user', user.id)
         return abort(503, 'Provider error')
 
     except SQLAlchemyError as e:
@@ -83,6 +107,7 @@ def resume():
 
 @module.route('/resume', methods=['POST'])
 @jwt_required
+@rate_limited('RATELIMIT_RESUME')
 @validation_required({'uniq': {'type': 'string', 'required': True}})
 def resume_toggle():
     """
@@ -117,6 +142,7 @@ def resume_toggle():
     :statuscode 200: OK
     :statuscode 400: invalid JSON in request's body
     :statuscode 401: auth errors
+    :statuscode 429: too many requests, see Retry-After
     :statuscode 500: unexpected errors
     """
     try:
@@ -133,6 +159,10 @@ def resume_toggle():
         db.session.add(resume)
         db.session.commit()
 
+        bump_resume_version(user.id)
+        if resume.enabled:
+            enqueue('push_resume', resume.id)
+
     except SQLAlchemyError as e:
         current_app.logger.error(f'{type(e).__name__}: {e}', exc_info=1)
         return abort(500, 'Database error')
@@ -140,3 +170,74 @@ def resume_toggle():
     else:
         current_app.logger.info(f'Resume toggled: {resume}')
         return jsonify(enabled=resume.enabled)
+
+
+@module.route('/resume/events', methods=['GET'])
+@jwt_required
+def events():
+    """
+    User's push and reauth outcomes newer than ``since`` (long polling),
+    waits for the next outcome when there are none yet, clients should
+    repeat the request with the ``created`` of the last event they got
+
+    .. :quickref: protected; Wait for push/reauth outcomes as they happen
+
+    **Request**:
+
+        .. sourcecode:: http
+
+            GET /resume/events?since=2019-01-28T10:12:43.123456 HTTP/1.1
+            Authorization: JWT q1w2.e3r4.t5y
+
+    **Response**:
+
+        .. sourcecode:: http
+
+            HTTP/1.1 200 OK
+            Content-Type: application/json
+
+            [
+                {
+                    "created": "2019-01-28T10:42:43.654321",
+                    "provider": "headhunter",
+                    "status": 204,
+                    "success": true,
+                    "task": "push",
+                    "uniq": "q1w2e3r4t5y6"
+                }
+            ]
+
+    :query since: ``created`` of the last seen event, recent ones without it
+    :reqheader Authorization: valid JWT token
+
+    :statuscode 200: OK, an empty list when nothing happened while waiting
+        or when EVENTS_WAITERS requests of this process wait already
+    :statuscode 401: auth errors
+    :statuscode 500: unexpected errors
+    """
+    redis = current_app.redis
+    user_id = get_jwt_identity()
+    since = request.args.get('since', '')
+
+    def recent():
+        rows = [json.loads(row) for row in
+                redis.lrange(f'events:recent:{user_id}', 0, -1)]
+        return [row for row in reversed(rows) if row['created'] > since]
+
+    found = recent()
+    if found or not current_app.events_waiters.acquire(blocking=False):
+        return jsonify(found)  # all waiting threads busy, client polls again
+
+    pubsub = redis.pubsub(ignore_subscribe_messages=True)
+    try:
+        pubsub.subscribe(f'events:{user_id}')
+        found = recent()  # again, published before the subscription
+        deadline = monotonic() + current_app.config['EVENTS_WAIT']
+        while not found and monotonic() < deadline:
+            if pubsub.get_message(timeout=deadline - monotonic()):
+                found = recent()
+    finally:
+        pubsub.close()
+        current_app.events_waiters.release()
+
+    return jsonify(found)
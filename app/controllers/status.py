@@ -1,19 +1,44 @@
+from time import time
+
 from flask import Blueprint, current_app, abort, jsonify
 from sqlalchemy.exc import SQLAlchemyError
 from redis import RedisError
 
 from .. import cache, __version__
 from ..models import User, Resume
+from ..utils import conditional
 
 
 module = Blueprint('status', __name__)
 
 
+def generation():
+    try:
+        return cache.get('stats.generation')
+    except RedisError:
+        return None
+
+
+@module.route('/ready', methods=['GET'])
+def ready():
+    """
+    Readiness probe, 503 until the process has warmed up its connections
+    and caches (``WARMUP``), then 200
+
+    .. :quickref: stats; Readiness probe
+    """
+    if not current_app.ready.is_set():
+        return abort(503, 'Warming up')
+    return jsonify(ready=True)
+
+
 @module.route('/stats', methods=['GET'])
+@conditional(generation)
 @cache.cached()
 def main():
     """
-    Application's usage statistic, update every 5 minutes
+    Application's usage statistic, update every 5 minutes,
+    answers 304 to If-None-Match with the current ETag
 
     .. :quickref: stats; Application's usage statistic
     """
@@ -40,6 +65,8 @@ def main():
             }
             result['providers'].append(provider)
 
+        cache.set('stats.generation', f'{int(time() * 1000):x}')
+
     except RedisError as e:
         current_app.logger.error(f'Redis error: {e}')
         return abort(503, 'Redis unavailable')
@@ -0,0 +1,161 @@
+import io
+import os
+import csv
+import gzip
+from datetime import datetime
+
+from sqlalchemy import Boolean, DateTime, Integer, func, literal_column, select
+
+from . import db
+from .models import User, Resume
+
+
+TABLES = (User.__table__, Resume.__table__)  # in foreign key order
+REDACTED = {'users': ('access', 'refresh')}
+
+
+def path(directory, table):
+    return os.path.join(directory, f'{table.name}.csv.gz')
+
+
+def postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def export(directory, redact=False, batch=1000):
+    """Streams tables to gzipped CSV files, returns row counts"""
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for table in TABLES:
+        hidden = REDACTED.get(table.name, ()) if redact else ()
+        columns = [
+            literal_column("'redacted'").label(c.name)
+            if c.name in hidden else c for c in table.columns]
+        query = select(columns).order_by(table.c.id)
+        with gzip.open(path(directory, table), 'wb') as f:
+            if postgres():
+                counts[table.name] = _copy_out(query, f)
+            else:
+                counts[table.name] = _write(query, f, batch)
+    return counts
+
+
+def load(directory, batch=1000):
+    """Streams gzipped CSV files into empty tables, returns row counts"""
+    for table in TABLES:
+        rows = db.session.execute(
+            select([func.count()]).select_from(table)).scalar()
+        if rows:
+            raise ValueError(f'Table {table.name} is not empty: {rows} rows')
+
+    counts = {}
+    for table in TABLES:
+        with gzip.open(path(directory, table), 'rb') as f:
+            if postgres():
+                counts[table.name] = _copy_in(table, f)
+            else:
+                counts[table.name] = _insert(table, f, batch)
+    return counts
+
+
+def _copy_out(query, f):
+    sql = str(query.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    conn = db.engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.copy_expert(f'COPY ({sql}) TO STDOUT WITH CSV HEADER', f)
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def _header(table, names):
+    """Dump's own column order, maybe older, only of the table's columns"""
+    unknown = [name for name in names if name not in table.c]
+    if unknown or len(set(names)) != len(names):
+        raise ValueError(
+            f'Unexpected {table.name} columns: {", ".join(unknown or names)}')
+    return names
+
+
+def _copy_in(table, f):
+    line = f.readline().decode()
+    names = _header(table, next(csv.reader([line])))
+    quote = db.engine.dialect.identifier_preparer
+    name = quote.format_table(table)
+    columns = ', '.join(quote.quote(column) for column in names)
+    conn = db.engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.copy_expert(f'COPY {name} ({columns}) FROM STDIN WITH CSV', f)
+        total = cursor.rowcount
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), "
+            f'coalesce(max(id), 1)) FROM {name}')
+        conn.commit()
+        return total
+    finally:
+        conn.close()
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return value
+
+
+def _write(query, f, batch):
+    out = io.TextIOWrapper(f, encoding='utf-8', newline='')
+    writer, total = csv.writer(out), 0
+    result = db.session.connection().execution_options(
+        stream_results=True).execute(query)
+    writer.writerow(result.keys())
+    while True:
+        rows = result.fetchmany(batch)
+        if not rows:
+            break
+        writer.writerows([_text(v) for v in row] for row in rows)
+        total += len(rows)
+    out.flush()
+    out.detach()
+    return total
+
+
+def _boolean(value):
+    return value in ('t', 'true', '1')
+
+
+def _datetime(value):
+    fmt = '%Y-%m-%d %H:%M:%S.%f' if '.' in value else '%Y-%m-%d %H:%M:%S'
+    return datetime.strptime(value, fmt)
+
+
+def _parser(column):
+    parse = str
+    for kind, parser in ((Boolean, _boolean), (DateTime, _datetime),
+                         (Integer, int)):
+        if isinstance(column.type, kind):
+            parse = parser
+    return lambda v: None if v == '' and column.nullable else parse(v)
+
+
+def _insert(table, f, batch):
+    reader = csv.reader(io.TextIOWrapper(f, encoding='utf-8', newline=''))
+    header = _header(table, next(reader))
+    parsers = [_parser(table.c[name]) for name in header]
+    rows, total = [], 0
+    for values in reader:
+        rows.append({name: parse(v) for name, parse, v in
+                     zip(header, parsers, values)})
+        if len(rows) >= batch:
+            db.session.execute(table.insert(), rows)
+            total, rows = total + len(rows), []
+    if rows:
+        db.session.execute(table.insert(), rows)
+        total += len(rows)
+    db.session.commit()
+    return total
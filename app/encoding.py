@@ -0,0 +1,41 @@
+from flask.json import JSONEncoder as BaseEncoder, JSONDecoder as BaseDecoder
+
+from .providers import Record
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json is the fallback
+    orjson = None
+
+
+class JSONEncoder(BaseEncoder):
+    """Flask encoder on orjson, dates still go through default() so
+    responses keep Flask's HTTP date format"""
+
+    def encode(self, o):
+        if orjson is None or self.indent not in (None, 2):
+            return super().encode(o)
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            rv = orjson.dumps(o, default=self.default, option=option)
+            return rv.decode()
+        except orjson.JSONEncodeError:  # non-str keys, big ints and the like
+            return super().encode(o)
+
+    def default(self, o):
+        if isinstance(o, Record):
+            return o.asdict()
+        return super().default(o)
+
+
+class JSONDecoder(BaseDecoder):
+    """Flask decoder on orjson, errors are still ValueError"""
+
+    def decode(self, s, *args, **kwargs):
+        if orjson is None:
+            return super().decode(s, *args, **kwargs)
+        return orjson.loads(s)
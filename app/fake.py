@@ -0,0 +1,281 @@
+import random
+from time import sleep, time
+from zlib import crc32
+from datetime import datetime, timezone
+from threading import Lock
+
+from flask import Flask, Blueprint, abort, jsonify, redirect, request
+
+from .providers import (
+    BaseProvider, IdentityError, PushError, ResumeError, TokenError, Record)
+
+
+class Latency(object):
+    """Call latency distribution: fixed, uniform or lognormal, in seconds"""
+
+    kinds = ('fixed', 'uniform', 'lognormal')
+
+    def __init__(self, kind='fixed', median=0.0, spread=0.0, seed=None):
+        if kind not in self.kinds:
+            raise ValueError(f'Unknown latency kind: {kind}')
+        self.kind = kind
+        self.median = median
+        self.spread = spread
+        self._random = random.Random(seed)
+
+    @classmethod
+    def parse(cls, spec, seed=None):
+        """'fixed:0.1', 'uniform:0.05:0.2' or 'lognormal:0.1:0.5'"""
+        kind, *args = spec.split(':')
+        return cls(kind, *(float(arg) for arg in args), seed=seed)
+
+    def sample(self):
+        if self.kind == 'uniform':
+            return self._random.uniform(self.median, self.spread)
+        if self.kind == 'lognormal':
+            return self.median * self._random.lognormvariate(0, self.spread)
+        return self.median
+
+    def __str__(self):
+        return f'{self.kind}:{self.median}:{self.spread}'
+
+
+class Accounts(object):
+    """Synthetic accounts, resumes are derived from account number"""
+
+    epoch = 1546300800  # 2019-01-01
+
+    def __init__(self, resumes=3):
+        if not 0 < resumes < 10:
+            raise ValueError('Resumes per account must be in 1..9')
+        self.resumes = resumes
+        self._published = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def account(value):
+        value = str(value)
+        return int(value) if value.isdigit() else crc32(value.encode())
+
+    def count(self, account):
+        return 1 + account % self.resumes
+
+    def owns(self, account, resume):
+        return resume // 10 == account and resume % 10 < self.count(account)
+
+    def resume_ids(self, account):
+        return [account * 10 + i for i in range(self.count(account))]
+
+    def published(self, resume):
+        return self._published.get(resume, self.epoch + resume % 86400)
+
+    def publish(self, resume):
+        with self._lock:
+            self._published[resume] = int(time())
+
+    def tokens(self, account):
+        nonce = random.getrandbits(32)
+        return {
+            'access_token': f'access-{account}-{nonce:x}',
+            'refresh_token': f'refresh-{account}-{nonce:x}',
+            'expires_in': 1209600,
+            'token_type': 'bearer'
+        }
+
+
+class FakeProvider(BaseProvider):
+    """In-process provider stub over synthetic accounts"""
+
+    def __init__(self, name, latency=None, error_rate=0.0, resumes=3,
+                 seed=None, strict=True, sleep=sleep):
+        super().__init__(
+            name=name, redirect_uri='', client_id='fake',
+            client_secret='fake')
+        self.latency = latency or Latency()
+        self.accounts = Accounts(resumes)
+        self.error_rate = error_rate
+        self.strict = strict  # reject tokens and resumes it did not issue
+        self._random = random.Random(seed)
+        self._sleep = sleep
+
+    def _call(self, error, token=None, kind='access'):
+        self._sleep(self.latency.sample())
+        if self._random.random() < self.error_rate:
+            raise error('503 service_unavailable', 503)
+        if token is None:
+            return None
+        prefix, _, rest = str(token).partition('-')
+        if prefix == kind and rest:
+            return Accounts.account(rest.partition('-')[0])
+        if self.strict:
+            raise error('403 bad_authorization', 403)
+        return Accounts.account(token)
+
+    def redirect(self):
+        return f'/{self.name}/authorize'
+
+    def identity(self, token):
+        account = self._call(IdentityError, token)
+        return f'user{account}@example.com'
+
+    def fetch(self, token):
+        account = self._call(ResumeError, token)
+        return [Record(
+            uniq=str(resume),
+            name=f'User {account}',
+            title=f'Resume {resume}',
+            published=datetime.utcfromtimestamp(
+                self.accounts.published(resume)),
+            link=f'/{self.name}/resumes/{resume}'
+        ) for resume in self.accounts.resume_ids(account)]
+
+    def push(self, token, resume):
+        account = self._call(PushError, token)
+        if not self.strict:
+            return 204
+        if not str(resume).isdigit() or \
+                not self.accounts.owns(account, int(resume)):
+            raise PushError('404 resume_not_found', 404)
+        self.accounts.publish(int(resume))
+        return 204
+
+    def tokenize(self, code, refresh=False):
+        if refresh:
+            account = self._call(TokenError, code, kind='refresh')
+        else:
+            self._call(TokenError)
+            account = Accounts.account(code)
+        return self.accounts.tokens(account)
+
+
+def create_fake_app(latency=None, error_rate=0.0, throttle_rate=0.0,
+                    resumes=3, seed=None):
+    app = Flask(__name__)
+    app.latency = latency or Latency()
+    app.accounts = Accounts(resumes)
+    chance = random.Random(seed)
+
+    def error(status, message, **headers):
+        response = jsonify(status=status, errors=[{'value': message}])
+        response.status_code = status
+        response.headers.extend(headers)
+        return response
+
+    def authorized():
+        token = request.args.get('access_token') or \
+            request.headers.get('Authorization', '').rpartition(' ')[2]
+        kind, _, rest = token.partition('-')
+        if kind != 'access' or not rest:
+            return abort(error(403, 'bad_authorization'))
+        return Accounts.account(rest.partition('-')[0])
+
+    def conditional(response):
+        response.add_etag()
+        return response.make_conditional(request)
+
+    def token_from(value, refresh=False):
+        if not value:
+            return error(400, 'invalid_request')
+        if refresh:
+            kind, _, rest = value.partition('-')
+            if kind != 'refresh':
+                return error(400, 'invalid_grant')
+            value = rest.partition('-')[0]
+        return jsonify(app.accounts.tokens(Accounts.account(value)))
+
+    @app.before_request
+    def simulate():
+        sleep(app.latency.sample())
+        if request.endpoint and request.endpoint.endswith('authorize'):
+            return None
+        roll = chance.random()
+        if roll < throttle_rate:
+            return error(429, 'too_many_requests', **{'Retry-After': '1'})
+        if roll < throttle_rate + error_rate:
+            return error(503, 'service_unavailable')
+
+    hh = Blueprint('hh', __name__, url_prefix='/hh')
+    sj = Blueprint('sj', __name__, url_prefix='/sj')
+
+    @hh.route('/authorize', methods=['GET'])
+    @sj.route('/authorize', methods=['GET'])
+    def authorize():
+        code = request.args.get('code') or random.randrange(10 ** 7)
+        return redirect(f'{request.args.get("redirect_uri", "/")}?code={code}')
+
+    @hh.route('/token', methods=['POST'])
+    def hh_token():
+        if request.form.get('grant_type') == 'refresh_token':
+            return token_from(request.form.get('refresh_token'), True)
+        return token_from(request.form.get('code'))
+
+    @hh.route('/me', methods=['GET'])
+    def hh_me():
+        account = authorized()
+        return jsonify(id=account, email=f'user{account}@example.com')
+
+    @hh.route('/resumes/mine', methods=['GET'])
+    def hh_resumes():
+        account = authorized()
+        items = []
+        for resume in app.accounts.resume_ids(account):
+            published = datetime.fromtimestamp(
+                app.accounts.published(resume), timezone.utc)
+            items.append({
+                'id': f'{resume:x}',
+                'first_name': 'User',
+                'last_name': f'{account}',
+                'title': f'Resume {resume}',
+                'updated_at': published.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'url': f'{request.url_root}hh/resumes/{resume:x}'
+            })
+        return conditional(jsonify(items=items, found=len(items)))
+
+    @hh.route('/resumes/<resume>/publish', methods=['POST'])
+    def hh_publish(resume):
+        account = authorized()
+        resume = int(resume, 16) if all(
+            c in '0123456789abcdef' for c in resume) else -1
+        if not app.accounts.owns(account, resume):
+            return error(404, 'resume_not_found')
+        app.accounts.publish(resume)
+        return '', 204
+
+    @sj.route('/token', methods=['POST'])
+    def sj_token():
+        return token_from(request.form.get('code'))
+
+    @sj.route('/token/refresh', methods=['GET'])
+    def sj_refresh():
+        return token_from(request.args.get('refresh_token'), True)
+
+    @sj.route('/user/current/', methods=['GET'])
+    def sj_me():
+        account = authorized()
+        return jsonify(id=account, email=f'user{account}@example.com')
+
+    @sj.route('/user_cvs/', methods=['GET'])
+    def sj_resumes():
+        account = authorized()
+        objects = [{
+            'id': resume,
+            'firstname': 'User',
+            'lastname': f'{account}',
+            'profession': f'Resume {resume}',
+            'date_published': app.accounts.published(resume),
+            'link': f'{request.url_root}sj/user_cvs/{resume}'
+        } for resume in app.accounts.resume_ids(account)]
+        return conditional(jsonify(objects=objects, total=len(objects)))
+
+    @sj.route('/user_cvs/update_datepub/<int:resume>/', methods=['POST'])
+    def sj_publish(resume):
+        account = authorized()
+        if not app.accounts.owns(account, resume):
+            return error(404, 'resume_not_found')
+        app.accounts.publish(resume)
+        return jsonify(result=True)
+
+    app.register_blueprint(hh)
+    app.register_blueprint(sj)
+
+    return app
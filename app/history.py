@@ -0,0 +1,105 @@
+import json
+from time import monotonic
+from datetime import datetime, timedelta
+
+from flask import current_app
+from redis import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import db
+from .models import Outcome
+
+
+class OutcomeWriter(object):
+    """Buffers task outcomes and writes them with one INSERT per batch"""
+
+    def __init__(self, task, size=None, interval=None):
+        self.task = task
+        self._size = size or current_app.config['HISTORY_BUFFER']
+        self._interval = interval or current_app.config['HISTORY_FLUSH']
+        self._rows = []
+        self._events = []
+        self._flushed = monotonic()
+
+    def add(self, uniq, provider, status, latency, owner=None):
+        row = {
+            'task': self.task,
+            'uniq': uniq,
+            'provider': provider,
+            'status': status,
+            'latency': int(latency * 1000),
+            'created': datetime.utcnow()
+        }
+        self._rows.append(row)
+        if owner is not None:
+            self._events.append((owner, row))
+        if len(self._rows) >= self._size or \
+                monotonic() - self._flushed >= self._interval:
+            self.flush()
+
+    def flush(self):
+        rows, self._rows = self._rows, []
+        events, self._events = self._events, []
+        self._flushed = monotonic()
+        if events:
+            self.notify(events)
+        if not rows:
+            return 0
+
+        table = Outcome.__table__
+        try:
+            if db.engine.dialect.name == 'postgresql':
+                db.session.execute(table.insert().values(rows))
+            else:
+                db.session.execute(table.insert(), rows)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.warning(
+                f'History flush failed: {len(rows)} rows lost, err={e}')
+            return 0
+
+        return len(rows)
+
+    def notify(self, events):
+        """Keeps owners' recent outcomes for /resume/events and wakes up
+        its waiting requests, bumps /resume versions"""
+        buffer = current_app.config['EVENTS_BUFFER']
+        ttl = current_app.config['EVENTS_TTL']
+        try:
+            pipe = current_app.redis.pipeline(transaction=False)
+            for owner, row in events:
+                success = bool(row['status']) and 200 <= row['status'] < 300
+                if success and self.task == 'push':
+                    pipe.incr(f'resume:version:{owner}')
+                event = json.dumps({
+                    'task': row['task'],
+                    'uniq': row['uniq'],
+                    'provider': row['provider'],
+                    'status': row['status'],
+                    'success': success,
+                    'created': row['created'].isoformat()
+                })
+                recent = f'events:recent:{owner}'
+                pipe.lpush(recent, event)
+                pipe.ltrim(recent, 0, buffer - 1)
+                pipe.expire(recent, ttl)
+                pipe.publish(f'events:{owner}', event)
+            pipe.execute()
+        except RedisError as e:
+            current_app.logger.warning(
+                f'History notify failed: {len(events)} events lost, err={e}')
+
+
+def prune(days, batch=10000):
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    total = 0
+    while True:
+        ids = db.session.query(Outcome.id).filter(
+            Outcome.created < cutoff).limit(batch).subquery()
+        deleted = Outcome.query.filter(Outcome.id.in_(ids)).delete(
+            synchronize_session=False)
+        db.session.commit()
+        total += deleted
+        if deleted < batch:
+            return total
@@ -0,0 +1,106 @@
+from uuid import uuid4
+
+
+RENEW = '''
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+'''
+
+RELEASE = '''
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+'''
+
+FINISH = '''
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    if ARGV[2] == '1' then
+        redis.call('del', KEYS[2])
+    end
+    return redis.call('del', KEYS[1])
+end
+return 0
+'''
+
+
+class Lease(object):
+    """Expiring Redis lock, only its owner can renew or release it"""
+
+    def __init__(self, redis, name, ttl, owner=None):
+        self.redis = redis
+        self.key = f'lease:{name}'
+        self.ttl = ttl
+        self.owner = owner or uuid4().hex
+        self._renew = redis.register_script(RENEW)
+        self._release = redis.register_script(RELEASE)
+
+    def acquire(self):
+        return bool(self.redis.set(
+            self.key, self.owner, px=int(self.ttl * 1000), nx=True))
+
+    def renew(self):
+        return bool(self._renew(
+            keys=[self.key], args=[self.owner, int(self.ttl * 1000)]))
+
+    def hold(self):
+        return self.renew() or self.acquire()
+
+    def release(self):
+        return bool(self._release(keys=[self.key], args=[self.owner]))
+
+    def holder(self):
+        holder = self.redis.get(self.key)
+        return holder.decode() if holder else None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def __str__(self):
+        return f'{self.key}, owner={self.owner}'
+
+
+class Checkpoint(object):
+    """Leased task run that remembers the last processed id between runs"""
+
+    def __init__(self, redis, name, ttl, period):
+        self.redis = redis
+        self.lease = Lease(redis, f'task:{name}', ttl)
+        self.key = f'checkpoint:{name}'
+        self.period = period
+        self.lost = False
+        self._finish = redis.register_script(FINISH)
+
+    def start(self):
+        return self.lease.acquire()
+
+    def last(self):
+        return int(self.redis.get(self.key) or 0)
+
+    def renew(self):
+        if not self.lease.renew():
+            self.lost = True
+        return not self.lost
+
+    def save(self, last):
+        if not self.renew():
+            return False
+        self.redis.set(self.key, last, ex=int(self.period))
+        return True
+
+    def finish(self, done=True):
+        """Releases the lease, a finished run also forgets its checkpoint,
+        unless the lease expired and the checkpoint is another run's now"""
+        if self.lost:
+            return
+        self._finish(
+            keys=[self.lease.key, self.key],
+            args=[self.lease.owner, 1 if done else 0])
+
+    def __str__(self):
+        return f'{self.key}, last={self.last()}'
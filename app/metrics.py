@@ -0,0 +1,103 @@
+import os
+from time import time, monotonic
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from prometheus_client import (
+    REGISTRY, CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram,
+    generate_latest, start_http_server, multiprocess)
+
+from . import providers
+
+
+MULTIPROCESS_DIR = os.getenv('prometheus_multiproc_dir')
+
+PROVIDER_LATENCY = Histogram(
+    'pushresume_provider_seconds', 'Provider call latency',
+    ['provider', 'method'])
+PROVIDER_CALLS = Counter(
+    'pushresume_provider_calls_total', 'Provider calls by status',
+    ['provider', 'method', 'status'])
+TASK_DURATION = Histogram(
+    'pushresume_task_seconds', 'Task run duration', ['task'],
+    buckets=(.1, .5, 1, 5, 10, 30, 60, 300, 900, 1800, 3600, float('inf')))
+TASK_LAG = Histogram(
+    'pushresume_task_lag_seconds', 'Time between task publish and start',
+    ['task'], buckets=(.01, .1, .5, 1, 5, 10, 30, 60, 300, float('inf')))
+DB_QUERIES = Histogram(
+    'pushresume_db_queries', 'DB queries per request', ['endpoint'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, float('inf')))
+
+
+def registry():
+    if not MULTIPROCESS_DIR:
+        return REGISTRY
+    collector = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector)
+    return collector
+
+
+def exposition():
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
+
+
+def observe_provider(provider, method, status, elapsed):
+    PROVIDER_LATENCY.labels(provider.name, method).observe(elapsed)
+    PROVIDER_CALLS.labels(provider.name, method, str(status)).inc()
+
+
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.queries = g.get('queries', 0) + 1
+
+
+def start_request():
+    g.queries = 0
+
+
+def finish_request(response):
+    endpoint = request.endpoint or 'unknown'
+    DB_QUERIES.labels(endpoint).observe(g.get('queries', 0))
+    return response
+
+
+def install(app, celery=False):
+    if observe_provider not in providers.hooks:
+        providers.hooks.append(observe_provider)
+
+    if not celery:
+        event.listen(Engine, 'before_cursor_execute', count_query)
+        app.before_request(start_request)
+        app.after_request(finish_request)
+        return
+
+    from celery import signals
+
+    @signals.before_task_publish.connect(weak=False)
+    def stamp(headers=None, **kwargs):
+        if headers is not None:
+            headers.setdefault('published', time())
+
+    @signals.task_prerun.connect(weak=False)
+    def prerun(task=None, **kwargs):
+        published = task.request.get('published') or \
+            (task.request.headers or {}).get('published')
+        if published:
+            TASK_LAG.labels(task.name).observe(max(time() - published, 0))
+        task.request.started = monotonic()
+
+    @signals.task_postrun.connect(weak=False)
+    def postrun(task=None, **kwargs):
+        started = getattr(task.request, 'started', None)
+        if started:
+            TASK_DURATION.labels(task.name).observe(monotonic() - started)
+
+    @signals.worker_ready.connect(weak=False)
+    def serve(**kwargs):
+        start_http_server(app.config['METRICS_PORT'], registry=registry())
+
+    @signals.worker_process_shutdown.connect(weak=False)
+    def cleanup(pid=None, **kwargs):
+        if MULTIPROCESS_DIR:
+            multiprocess.mark_process_dead(pid or os.getpid())
@@ -1,9 +1,44 @@
-from datetime import datetime
+from zlib import crc32
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql
 
 from . import db
 
 
-class User(db.Model):
+SLOTS = 3600  # stable hash buckets of resumes for scheduling
+
+
+def slot_of(uniq):
+    return crc32(uniq.encode()) % SLOTS
+
+
+class Backoff(object):
+
+    failures = db.Column(db.Integer, default=0, nullable=False)
+    retry_at = db.Column(db.DateTime)
+    quarantined = db.Column(db.Boolean, default=False, nullable=False)
+
+    @classmethod
+    def due(cls):
+        return db.and_(
+            cls.quarantined.is_(False),
+            db.or_(cls.retry_at.is_(None), cls.retry_at <= datetime.utcnow()))
+
+    def fail(self, base, limit, threshold):
+        self.failures = (self.failures or 0) + 1
+        delay = min(base * 2 ** (self.failures - 1), limit)
+        self.retry_at = datetime.utcnow() + timedelta(seconds=delay)
+        self.quarantined = self.failures >= threshold
+
+    def recover(self):
+        self.failures = 0
+        self.retry_at = None
+        self.quarantined = False
+
+
+class User(Backoff, db.Model):
 
     __tablename__ = 'users'
     __table_args__ = (db.Index('uniq', 'uniq', 'provider', unique=True),)
@@ -19,11 +54,51 @@ class User(db.Model):
     resume = db.relationship(
         'Resume', foreign_keys='Resume.user_id', backref='owner')
 
+    @classmethod
+    def upsert(cls, uniq, provider, **values):
+        """Inserts or updates the user, recovers it with its resumes from
+        backoff and returns the user id, one round trip on PostgreSQL"""
+        values.update(failures=0, retry_at=None, quarantined=False,
+                      updated=datetime.utcnow())
+        if db.engine.dialect.name == 'postgresql':
+            stmt = postgresql.insert(cls.__table__).values(
+                uniq=uniq, provider=provider, **values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['uniq', 'provider'], set_=values)
+            user_id = db.session.execute(
+                stmt.returning(cls.__table__.c.id)).scalar()
+        else:
+            user_id = cls._merge(uniq, provider, values)
+
+        db.session.execute(Resume.__table__.update().where(
+            Resume.__table__.c.user_id == user_id).values(
+                failures=0, retry_at=None, quarantined=False))
+        db.session.commit()
+        return user_id
+
+    @classmethod
+    def _merge(cls, uniq, provider, values):
+        user = cls.query.filter_by(uniq=uniq, provider=provider).first()
+        if not user:
+            user = cls(uniq=uniq, provider=provider, **values)
+            db.session.add(user)
+            try:
+                db.session.flush()
+                return user.id
+            except IntegrityError:  # concurrent login inserted it first
+                db.session.rollback()
+                user = cls.query.filter_by(uniq=uniq, provider=provider).one()
+
+        for key, value in values.items():
+            setattr(user, key, value)
+        db.session.flush()
+        return user.id
+
     def __str__(self):
         return f'{self.uniq}, provider={self.provider}'
 
 
-class Resume(db.Model):
+class Resume(Backoff, db.Model):
 
     __tablename__ = 'resume'
 
@@ -31,6 +106,29 @@ class Resume(db.Model):
     uniq = db.Column(db.String(120), unique=True, nullable=False)
     enabled = db.Column(db.Boolean, default=False, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    slot = db.Column(
+        db.SmallInteger, nullable=False, index=True,
+        default=lambda ctx: slot_of(ctx.get_current_parameters()['uniq']))
 
     def __str__(self):
         return f'{self.uniq}, enabled={self.enabled}, user={self.owner}'
+
+
+class Outcome(db.Model):
+
+    __tablename__ = 'outcomes'
+    __table_args__ = (
+        db.Index('outcomes_provider_created', 'provider', 'created'),)
+
+    id = db.Column(
+        db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    task = db.Column(db.String(20), nullable=False)
+    uniq = db.Column(db.String(120), nullable=False)
+    provider = db.Column(db.String(120), nullable=False)
+    status = db.Column(db.SmallInteger)
+    latency = db.Column(db.Integer, nullable=False)  # ms
+    created = db.Column(
+        db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __str__(self):
+        return f'{self.task} {self.uniq}, status={self.status}'
@@ -0,0 +1,71 @@
+from hashlib import sha1
+
+from .locks import Lease
+
+
+def weight(node, partition):
+    return sha1(f'{node}:{partition}'.encode()).digest()
+
+
+def assign(nodes, partitions):
+    """Rendezvous hashing, a leaving node only moves its own partitions"""
+    if not nodes:
+        return {}
+    return {p: max(nodes, key=lambda node: weight(node, p))
+            for p in range(partitions)}
+
+
+def queue(node):
+    return f'node.{node}'
+
+
+class Membership(object):
+    """Node heartbeats and partition leases shared through Redis"""
+
+    key = 'partitions:nodes'
+
+    def __init__(self, redis, node, partitions, ttl):
+        self.redis = redis
+        self.node = node
+        self.partitions = partitions
+        self.ttl = ttl
+        self.owned = set()
+
+    def lease(self, partition):
+        return Lease(self.redis, f'partition:{partition}', self.ttl, self.node)
+
+    def now(self):
+        """Redis server time, the one clock all nodes agree on"""
+        seconds, microseconds = self.redis.time()
+        return seconds + microseconds / 1e6
+
+    def nodes(self):
+        now, live = self.now(), []
+        for node, seen in self.redis.hgetall(self.key).items():
+            if now - float(seen) < self.ttl:
+                live.append(node.decode())
+            else:
+                self.redis.hdel(self.key, node)
+        return sorted(live)
+
+    def owners(self):
+        keys = [self.lease(p).key for p in range(self.partitions)]
+        return {p: holder.decode()
+                for p, holder in enumerate(self.redis.mget(keys)) if holder}
+
+    def heartbeat(self):
+        self.redis.hset(self.key, self.node, self.now())
+        owners = assign(self.nodes(), self.partitions)
+        wanted = {p for p, node in owners.items() if node == self.node}
+
+        for partition in self.owned - wanted:
+            self.lease(partition).release()
+
+        self.owned = {p for p in wanted if self.lease(p).hold()}
+        return self.owned
+
+    def leave(self):
+        for partition in self.owned:
+            self.lease(partition).release()
+        self.owned = set()
+        self.redis.hdel(self.key, self.node)
@@ -1,9 +1,24 @@
-from rauth import OAuth2Service
+import json
+from time import sleep, monotonic
+from hashlib import sha1
+from datetime import datetime, timedelta, timezone
+from functools import wraps, lru_cache
+from threading import Event, Lock
+
+from rauth import OAuth2Service, OAuth2Session
+from redis import RedisError
+from requests.adapters import HTTPAdapter
+
+from ..locks import Lease
 
 
 class ProviderError(Exception):
     """Provider Error"""
 
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
 
 class IdentityError(ProviderError):
     """Identity Error"""
@@ -21,15 +36,325 @@ class TokenError(ProviderError):
     """Token Error"""
 
 
+@lru_cache(maxsize=64)
+def _zone(minutes):
+    return timezone(timedelta(minutes=minutes))
+
+
+def parse_timestamp(value):
+    """ISO 8601 as providers and isoformat() write it, e.g.
+    '2018-08-19T17:41:52+0300', several times faster than strptime"""
+    microsecond, rest = 0, value[19:]
+    if rest[:1] == '.':
+        end = 1
+        while end < len(rest) and rest[end].isdigit():
+            end += 1
+        microsecond = int(rest[1:end].ljust(6, '0')[:6])
+        rest = rest[end:]
+
+    tzinfo = None
+    if rest in ('Z', '+0000', '+00:00'):
+        tzinfo = timezone.utc
+    elif rest:
+        digits = rest[1:].replace(':', '')
+        minutes = int(digits[:2]) * 60 + int(digits[2:4])
+        tzinfo = _zone(-minutes if rest[0] == '-' else minutes)
+
+    return datetime(
+        int(value[0:4]), int(value[5:7]), int(value[8:10]),
+        int(value[11:13]), int(value[14:16]), int(value[17:19]),
+        microsecond, tzinfo)
+
+
+class Record(object):
+    """Provider's resume, normalized for both providers"""
+
+    __slots__ = ('uniq', 'name', 'title', 'published', 'link', 'enabled')
+
+    def __init__(self, uniq, name, title, published, link, enabled=None):
+        self.uniq = uniq
+        self.name = name
+        self.title = title
+        self.published = published
+        self.link = link
+        self.enabled = enabled
+
+    def asdict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def dump(self):
+        """Stable plain form for caches, enabled is ours, not provider's"""
+        return [self.uniq, self.name, self.title,
+                self.published.isoformat(), self.link]
+
+    @classmethod
+    def load(cls, values):
+        uniq, name, title, published, link = values
+        return cls(uniq, name, title, parse_timestamp(published), link)
+
+    def __eq__(self, other):
+        return isinstance(other, Record) and \
+            self.dump() == other.dump() and self.enabled == other.enabled
+
+    def __repr__(self):
+        return f'<Record {self.uniq}>'
+
+
+ERRORS = {error.__name__: error for error in (
+    ProviderError, IdentityError, ResumeError, PushError, TokenError)}
+
+hooks = []  # callables (provider, method, status, elapsed) for every call
+
+
+def observed(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not hooks:
+            return method(self, *args, **kwargs)
+        status, started = '2xx', monotonic()
+        try:
+            result = method(self, *args, **kwargs)
+            if isinstance(result, int):  # push answers with its status
+                status = result
+            return result
+        except ProviderError as e:
+            status = e.status or 'error'
+            raise
+        finally:
+            elapsed = monotonic() - started
+            for hook in hooks:
+                hook(self, method.__name__, status, elapsed)
+    return wrapper
+
+
+def dump_records(records):
+    return [record.dump() for record in records]
+
+
+def load_records(rows):
+    return [Record.load(row) for row in rows]
+
+
+class Flight(object):
+    """In-process call that identical concurrent calls wait for"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = Event()
+        self.result = self.error = None
+
+
+def coalesced(method, encode=None, decode=None):
+    """Identical concurrent calls share one upstream request: threads
+    wait for the leader's flight, processes for its Redis handoff,
+    calls without a result encoder are only shared in-process"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        call = (method.__name__, args, sorted(kwargs.items()))
+        key = sha1(repr(call).encode()).hexdigest()
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+
+        if not leader:
+            if not flight.done.wait(self._coalesce_ttl or None):
+                return method(self, *args, **kwargs)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            if encode is None:
+                flight.result = method(self, *args, **kwargs)
+            else:
+                flight.result = self._shared(
+                    key, encode, decode,
+                    lambda: method(self, *args, **kwargs))
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.done.set()
+    return wrapper
+
+
 class BaseProvider(object):
     """Base Provider"""
 
     _headers = {'User-Agent': 'PushResume'}
+    _observed = ('identity', 'fetch', 'push', 'tokenize')
+    _coalesced = {  # method: result encoder and decoder for the handoff
+        'identity': (str, str),
+        'fetch': (dump_records, load_records),
+        'push': ()  # in-process only, the bulk sweep hardly ever repeats one
+    }
+    _identity_key = None  # token response key carrying the account id
+    _handoff_ttl = 5  # sec, followers read the leader's result within it
+    _handoff_poll = 0.05  # sec
 
-    def __init__(self, name, redirect_uri, **kwargs):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in cls._observed:
+            if name in vars(cls):
+                method = observed(vars(cls)[name])
+                if name in cls._coalesced:
+                    method = coalesced(method, *cls._coalesced[name])
+                setattr(cls, name, method)
+
+    def __init__(self, name, redirect_uri, cache=None, cache_ttl=None,
+                 pool_size=10, coalesce_ttl=None, **kwargs):
         self.name = name
         self._redirect_uri = redirect_uri
-        self._prov = OAuth2Service(name=name, **kwargs)
+        self._cache = cache
+        self._cache_ttl = cache_ttl
+        self._coalesce_ttl = coalesce_ttl
+        self._flights = {}
+        self._flights_lock = Lock()
+        self._adapter = HTTPAdapter(pool_maxsize=pool_size)
+        self._prov = OAuth2Service(
+            name=name, session_obj=self._session, **kwargs)
+
+    def _session(self, *args, **kwargs):
+        """Sessions share one adapter, so connections are kept alive"""
+        session = OAuth2Session(*args, **kwargs)
+        session.mount('https://', self._adapter)
+        session.mount('http://', self._adapter)
+        return session
+
+    def preconnect(self, timeout=5):
+        """Opens a keep-alive connection, pays DNS and TLS up front"""
+        if self._prov.base_url:
+            self._prov.get_session().head(self._prov.base_url, timeout=timeout)
+
+    def _shared(self, key, encode, decode, call):
+        """Runs call() under a Redis lease or takes the result its holder
+        hands off, calls directly when Redis is not there to coordinate"""
+        if self._cache is None or not self._coalesce_ttl:
+            return call()
+
+        lease = Lease(
+            self._cache, f'provider:{self.name}:call:{key}',
+            self._coalesce_ttl)
+        deadline = monotonic() + self._coalesce_ttl
+        try:
+            while not lease.acquire():
+                if monotonic() >= deadline:
+                    return call()
+                handoff = self._handoff(lease, lease.holder(), deadline)
+                if handoff is not None:
+                    if 'error' in handoff:
+                        error = ERRORS.get(handoff['error'], ProviderError)
+                        raise error(handoff['message'], handoff['status'])
+                    return decode(handoff['result'])
+        except RedisError:
+            return call()
+
+        handoff = {}
+        try:
+            result = call()
+            handoff = {'result': encode(result)}
+            return result
+        except ProviderError as e:
+            handoff = {'error': type(e).__name__, 'message': str(e),
+                       'status': e.status}
+            raise
+        finally:
+            try:
+                if handoff:
+                    self._cache.set(
+                        f'{lease.key}:{lease.owner}', json.dumps(handoff),
+                        px=int(self._handoff_ttl * 1000))
+                lease.release()
+            except RedisError:
+                pass
+
+    def _handoff(self, lease, holder, deadline):
+        """Waits for the holder's result, None if it is lost or gone"""
+        key = f'{lease.key}:{holder}'
+        while holder and monotonic() < deadline:
+            handoff = self._cache.get(key)
+            if handoff is None and lease.holder() != holder:
+                handoff = self._cache.get(key)  # set just before release
+                if handoff is None:
+                    return None
+            if handoff is not None:
+                return json.loads(handoff)
+            sleep(self._handoff_poll)
+        return None
+
+    def account(self, ids):
+        """Account id from the token response, or asked with identity()"""
+        if self._identity_key and ids.get(self._identity_key):
+            return str(ids[self._identity_key])
+        return self.identity(ids['access_token'])
+
+    def _cache_key(self, token):
+        return f'provider:{self.name}:fetch:{sha1(token.encode()).hexdigest()}'
+
+    def _cached(self, token):
+        """Returns cached payload and validators for a conditional request"""
+        if self._cache is None:
+            return None, {}
+        try:
+            entry = self._cache.get(self._cache_key(token))
+        except RedisError:
+            return None, {}
+        if not entry:
+            return None, {}
+
+        try:
+            entry = json.loads(entry)
+            payload = [Record.load(values) for values in entry['payload']]
+        except (ValueError, KeyError, TypeError):  # foreign or stale format
+            return None, {}
+
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['modified']:
+            headers['If-Modified-Since'] = entry['modified']
+        return payload, headers
+
+    def _remember(self, token, rv, payload):
+        etag = rv.headers.get('ETag')
+        modified = rv.headers.get('Last-Modified')
+        if self._cache is None or not (etag or modified):
+            return
+        entry = {'etag': etag, 'modified': modified,
+                 'payload': [record.dump() for record in payload]}
+        try:
+            self._cache.set(
+                self._cache_key(token), json.dumps(entry),
+                ex=self._cache_ttl)
+        except RedisError:
+            pass
+
+    def _fetch(self, token, path, items, headers=None):
+        """Conditional resume list request, items parsed with _record"""
+        cached, validators = self._cached(token)
+        try:
+            session = self._prov.get_session(token=token)
+            rv = session.get(path, headers=dict(headers or {}, **validators))
+        except Exception as e:
+            raise ResumeError(f'{type(e).__name__}: {e}')
+        else:
+            if rv.status_code == 304 and cached is not None:
+                return cached
+            if rv.status_code != 200:
+                raise ResumeError(
+                    f'{rv.status_code} {rv.json()}', rv.status_code)
+            records = [self._record(item) for item in rv.json()[items]]
+            self._remember(token, rv, records)
+            return records
+
+    def _record(self, item):
+        raise NotImplementedError
 
     def redirect(self, back_url=None):
         raise NotImplementedError
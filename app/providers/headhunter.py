@@ -1,6 +1,5 @@
-from datetime import datetime
-
-from . import BaseProvider, IdentityError, ResumeError, PushError, TokenError
+from . import BaseProvider, IdentityError, PushError, TokenError
+from . import Record, parse_timestamp
 
 
 class Provider(BaseProvider):
@@ -17,30 +16,20 @@ class Provider(BaseProvider):
             raise IdentityError(f'{type(e).__name__}: {e}')
         else:
             if rv.status_code is not 200:
-                raise IdentityError(f'{rv.status_code} {rv.json()}')
+                raise IdentityError(
+                    f'{rv.status_code} {rv.json()}', rv.status_code)
             return rv.json()['email']
 
     def fetch(self, token):
-        try:
-            session = self._prov.get_session(token=token)
-            rv = session.get('resumes/mine')
-        except Exception as e:
-            raise ResumeError(f'{type(e).__name__}: {e}')
-        else:
-            if rv.status_code is not 200:
-                raise ResumeError(f'{rv.status_code} {rv.json()}')
-            arr = []
-            for item in rv.json()['items']:
-                published = datetime.strptime(
-                    item['updated_at'], '%Y-%m-%dT%H:%M:%S%z')
-                arr.append({
-                    'uniq': item['id'],
-                    'name': f'{item["first_name"]} {item["last_name"]}',
-                    'title': item['title'],
-                    'published': published,
-                    'link': item['url']
-                })
-            return arr
+        return self._fetch(token, 'resumes/mine', 'items')
+
+    def _record(self, item):
+        return Record(
+            uniq=item['id'],
+            name=f'{item["first_name"]} {item["last_name"]}',
+            title=item['title'],
+            published=parse_timestamp(item['updated_at']),
+            link=item['url'])
 
     def push(self, token, resume):
         try:
@@ -50,8 +39,9 @@ class Provider(BaseProvider):
             raise PushError(f'{type(e).__name__}: {e}')
         else:
             if rv.status_code not in range(200, 299):
-                raise PushError(f'{rv.status_code} {rv.json()}')
-            return True
+                raise PushError(
+                    f'{rv.status_code} {rv.json()}', rv.status_code)
+            return rv.status_code
 
     def tokenize(self, token, refresh=False):
         if not refresh:
@@ -65,5 +55,6 @@ class Provider(BaseProvider):
             raise TokenError(f'{type(e).__name__}: {e}')
         else:
             if rv.status_code is not 200:
-                raise TokenError(f'{rv.status_code} {rv.json()}')
+                raise TokenError(
+                    f'{rv.status_code} {rv.json()}', rv.status_code)
             return rv.json()
@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
 
-from . import BaseProvider, IdentityError, ResumeError, PushError, TokenError
+from . import BaseProvider, IdentityError, PushError, TokenError, Record
 
 
 class Provider(BaseProvider):
@@ -22,30 +22,21 @@ class Provider(BaseProvider):
             raise IdentityError(f'{type(e).__name__}: {e}')
         else:
             if rv.status_code is not 200:
-                raise IdentityError(f'{rv.status_code} {rv.json()}')
+                raise IdentityError(
+                    f'{rv.status_code} {rv.json()}', rv.status_code)
             return rv.json()['email']
 
     def fetch(self, token):
-        try:
-            session = self._prov.get_session(token=token)
-            rv = session.get('user_cvs/', headers=self._headers)
-        except Exception as e:
-            raise ResumeError(f'{type(e).__name__}: {e}')
-        else:
-            if rv.status_code is not 200:
-                raise ResumeError(f'{rv.status_code} {rv.json()}')
-            arr = []
-            for item in rv.json()['objects']:
-                timestamp = datetime.fromtimestamp(item['date_published'])
-                published = timestamp - timedelta(hours=3)
-                arr.append({
-                    'uniq': str(item['id']),
-                    'name': f'{item["firstname"]} {item["lastname"]}',
-                    'title': item['profession'],
-                    'published': published,
-                    'link': item['link']
-                })
-            return arr
+        return self._fetch(token, 'user_cvs/', 'objects', self._headers)
+
+    def _record(self, item):
+        timestamp = datetime.fromtimestamp(item['date_published'])
+        return Record(
+            uniq=str(item['id']),
+            name=f'{item["firstname"]} {item["lastname"]}',
+            title=item['profession'],
+            published=timestamp - timedelta(hours=3),
+            link=item['link'])
 
     def push(self, token, resume):
         try:
@@ -55,8 +46,9 @@ class Provider(BaseProvider):
             raise PushError(f'{type(e).__name__}: {e}')
         else:
             if rv.status_code not in range(200, 299):
-                raise PushError(f'{rv.status_code} {rv.json()}')
-            return True
+                raise PushError(
+                    f'{rv.status_code} {rv.json()}', rv.status_code)
+            return rv.status_code
 
     def tokenize(self, token, refresh=False):
         post = {
@@ -79,5 +71,6 @@ class Provider(BaseProvider):
             raise TokenError(f'{type(e).__name__}: {e}')
         else:
             if rv.status_code is not 200:
-                raise TokenError(f'{rv.status_code} {rv.json()}')
+                raise TokenError(
+                    f'{rv.status_code} {rv.json()}', rv.status_code)
             return rv.json()
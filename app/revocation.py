@@ -0,0 +1,111 @@
+from math import ceil, log
+from time import time, monotonic
+from hashlib import blake2b
+
+from redis import RedisError
+
+
+class BloomFilter(object):
+    """Bit array set, membership may be a false positive, never negative"""
+
+    def __init__(self, capacity, error=0.01):
+        self.size = ceil(-capacity * log(error) / log(2) ** 2)
+        self.hashes = max(round(self.size / capacity * log(2)), 1)
+        self.bits = bytearray(ceil(self.size / 8))
+
+    def _positions(self, item):
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'big'), \
+            int.from_bytes(digest[8:], 'big')
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & 1 << (position & 7)
+                   for position in self._positions(item))
+
+
+REVOKE = '''
+local version = redis.call('incr', KEYS[2])
+redis.call('zadd', KEYS[1], ARGV[1], ARGV[2])
+redis.call('zadd', KEYS[3], version, ARGV[2])
+redis.call('zremrangebyscore', KEYS[3], 0, version - ARGV[3])
+return version
+'''
+
+
+class Revocations(object):
+    """Revoked JWT ids in a Redis sorted set scored by token expiry,
+    mirrored in a local Bloom filter that catches up every `refresh`
+    seconds from a log of the latest revocations scored by version"""
+
+    key = 'jwt:revoked'
+    log = 1000  # latest revocations kept for catching up
+
+    def __init__(self, redis, capacity, refresh, logger):
+        self.redis = redis
+        self.capacity = capacity
+        self.refresh = refresh
+        self.logger = logger
+        self.bloom = BloomFilter(capacity)
+        self.count = 0
+        self.version = None
+        self.loaded = None
+        self._revoke = redis.register_script(REVOKE)
+
+    def revoke(self, jti, expires):
+        self._revoke(
+            keys=[self.key, f'{self.key}:version', f'{self.key}:log'],
+            args=[expires, jti, self.log])
+        self.bloom.add(jti)
+
+    def reload(self):
+        version = int(self.redis.get(f'{self.key}:version') or 0)
+        if self.loaded is None or not self._catch_up(version):
+            self._rebuild(version)
+        self.loaded = monotonic()
+
+    def _catch_up(self, version):
+        """Adds ids revoked since the loaded version, False on a gap or
+        when the filter is full of ids that may have expired since"""
+        if version == self.version:
+            return True
+        if version < self.version or self.count >= self.capacity:
+            return False
+        revoked = self.redis.zrangebyscore(
+            f'{self.key}:log', self.version + 1, version)
+        if len(revoked) != version - self.version:
+            return False
+        for jti in revoked:
+            self.bloom.add(jti.decode())
+        self.count += len(revoked)
+        self.version = version
+        return True
+
+    def _rebuild(self, version):
+        now = time()
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore(self.key, 0, now)
+        pipe.zrangebyscore(self.key, now, '+inf')
+        _, revoked = pipe.execute()
+
+        bloom = BloomFilter(max(self.capacity, len(revoked)))
+        for jti in revoked:
+            bloom.add(jti.decode())
+        self.bloom, self.count, self.version = bloom, len(revoked), version
+
+    def __contains__(self, jti):
+        try:
+            if self.loaded is None or \
+                    monotonic() - self.loaded >= self.refresh:
+                self.reload()
+            if jti not in self.bloom:
+                return False
+            expires = self.redis.zscore(self.key, jti)
+            return expires is not None and expires > time()
+        except RedisError as e:
+            self.logger.warning(f'Revocation check skipped: {jti}, err={e}')
+            return False
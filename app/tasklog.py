@@ -0,0 +1,61 @@
+import random
+from time import monotonic
+from collections import Counter
+
+from flask import current_app
+
+
+_logged = {}  # error signature -> when it was last logged, per process
+
+
+class RunLog(object):
+    """Task run log, aggregated per provider and status unless TASK_LOG=full
+
+    Successes are sampled at TASK_LOG_SAMPLE, an error signature is logged
+    once per TASK_LOG_ERRORS seconds, the rest goes to the run summary
+    """
+
+    def __init__(self, logger, action):
+        self.logger = logger
+        self.action = action
+        self.full = current_app.config['TASK_LOG'] == 'full'
+        self.sample = current_app.config['TASK_LOG_SAMPLE']
+        self.window = current_app.config['TASK_LOG_ERRORS']
+        self.counts = Counter()
+        self.suppressed = 0
+        self.started = monotonic()
+
+    def _first(self, signature):
+        if self.full:
+            return True
+        now = monotonic()
+        if now - _logged.get(signature, -self.window) < self.window:
+            self.suppressed += 1
+            return False
+        _logged[signature] = now
+        return True
+
+    def success(self, entity, provider, status):
+        self.counts[(provider, status)] += 1
+        if self.full or random.random() < self.sample:
+            self.logger.info(f'{self.action} success: {entity}')
+
+    def failure(self, entity, provider, e):
+        self.counts[(provider, e.status)] += 1
+        if self._first((self.action, provider, type(e).__name__, e.status)):
+            self.logger.warning(f'{self.action} failed: {entity}, status={e}')
+
+    def error(self, entity, provider, e):
+        self.counts[(provider, 'error')] += 1
+        if self._first((self.action, provider, type(e).__name__)):
+            self.logger.error(
+                f'{self.action} failed: {entity}, err={e}', exc_info=1)
+
+    def summary(self):
+        counts = ' '.join(
+            f'{provider}.{status}={count}' for (provider, status), count
+            in sorted(self.counts.items(), key=lambda i: str(i[0])))
+        self.logger.info(
+            f'{self.action} summary: total={sum(self.counts.values())} '
+            f'{counts} suppressed={self.suppressed} '
+            f'elapsed={monotonic() - self.started:.3f}s')
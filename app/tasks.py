@@ -1,18 +1,27 @@
+from time import time, monotonic
 from datetime import datetime, timedelta
+from functools import wraps
+from inspect import signature
+from threading import Event, Thread
 
-from celery import Celery
+from celery import signals
 from celery.utils.log import get_task_logger
+from redis import RedisError
 
 from . import create_app, db
-from .models import User, Resume
+from .history import OutcomeWriter, prune
+from .locks import Checkpoint, Lease
+from .models import SLOTS, User, Resume
+from .partitions import Membership, queue
+from .tasklog import RunLog
 from .providers import PushError, TokenError
-from .utils import load_sentry, load_scout_apm
+from .utils import load_sentry, load_scout_apm, load_metrics
 
 
 current_app = create_app()  # not app!
 current_app.app_context().push()
 
-celery = Celery('pushresume', broker=current_app.config['REDIS_URL'])
+celery = current_app.celery
 logger = get_task_logger(__name__)
 
 if current_app.config['SENTRY_DSN']:
@@ -21,21 +30,98 @@ if current_app.config['SENTRY_DSN']:
 if current_app.config['SCOUT_KEY']:
     load_scout_apm(current_app, db, celery=True)
 
+if current_app.config['METRICS']:
+    load_metrics(current_app, celery=True)
+
 default_result = {'total': 0, 'success': 0, 'failed': 0}
 
 
+def backoff(entity, error):
+    """Counts a failure against the entity, provider-wide throttling,
+    outages and connection errors are transient and do not"""
+    if error.status not in current_app.config['BACKOFF_STATUSES']:
+        return
+    entity.fail(
+        base=current_app.config['BACKOFF_BASE'],
+        limit=current_app.config['BACKOFF_MAX'],
+        threshold=current_app.config['QUARANTINE_THRESHOLD'])
+    db.session.add(entity)
+    db.session.commit()
+    if entity.quarantined:
+        logger.warning(f'Quarantined: {entity}, failures={entity.failures}')
+
+
+def guarded(name, period):
+    """Runs the task under a lease, a tick that overlaps a live run skips"""
+    def wrapper(func):
+        @wraps(func)
+        def decorator(*args, **kwargs):
+            bound = signature(func).bind(None, *args, **kwargs)
+            bound.apply_defaults()
+            run = Checkpoint(
+                current_app.redis, name.format(**bound.arguments),
+                current_app.config['TASK_LEASE_TTL'],
+                current_app.config[period])
+            if not run.start():
+                logger.warning(f'Task skipped, previous run is alive: {run}')
+                return {'skipped': True}
+
+            done = False
+            try:
+                result = func(run, *args, **kwargs)
+                done = True
+                return result
+            finally:
+                run.finish(done)
+        return decorator
+    return wrapper
+
+
+def keyset(run, query, column):
+    """Iterates rows by id in batches, saving a checkpoint after each one,
+    the lease is renewed every third of its ttl however slow rows are"""
+    size, last = current_app.config['TASK_BATCH'], run.last()
+    every, renewed = run.lease.ttl / 3, monotonic()
+    if last:
+        logger.info(f'Task resumed: {run}')
+    while True:
+        rows = query.filter(column > last).order_by(column).limit(size).all()
+        for row in rows:
+            yield row
+            if monotonic() - renewed >= every:
+                if not run.renew():
+                    logger.warning(f'Task stopped, lease lost: {run}')
+                    return
+                renewed = monotonic()
+        if len(rows) < size:
+            return
+        last = getattr(rows[-1], column.key)
+        if not run.save(last):
+            logger.warning(f'Task stopped, lease lost: {run}')
+            return
+        renewed = monotonic()
+
+
 @celery.on_after_configure.connect
 def setup_periodic_tasks(sender, **kwargs):
     sender.add_periodic_task(current_app.config['CLEANUP_PERIOD'], cleanup.s())
     sender.add_periodic_task(current_app.config['REAUTH_PERIOD'], reauth.s())
-    sender.add_periodic_task(current_app.config['PUSH_PERIOD'], push.s())
+    if current_app.config['PUSH_SPREAD']:
+        sender.add_periodic_task(
+            current_app.config['PUSH_PERIOD'] /
+            current_app.config['PUSH_SLICES'], push_slice.s())
+    else:
+        sender.add_periodic_task(current_app.config['PUSH_PERIOD'], push.s())
+    sender.add_periodic_task(
+        current_app.config['HISTORY_PRUNE_PERIOD'], history.s())
 
 
 @celery.task
-def cleanup():
+@guarded('cleanup', 'CLEANUP_PERIOD')
+def cleanup(run):
     result = default_result.copy()
-    resumes = Resume.query.filter_by(enabled=False).all()
-    for resume in resumes:
+    resumes = Resume.query.filter_by(enabled=False)
+    for resume in keyset(run, resumes, Resume.id):
         try:
             logger.warning(f'Cleanup: {resume}')
             db.session.delete(resume)
@@ -52,55 +138,226 @@ def cleanup():
 
 
 @celery.task
-def reauth():
+@guarded('reauth', 'REAUTH_PERIOD')
+def reauth(run):
+    users = User.query.filter(User.due())
+    return refresh(keyset(run, users, User.id))
+
+
+@celery.task
+def reauth_user(user_id):
+    user = User.query.get(user_id)
+    return refresh([user] if user and not user.quarantined else [])
+
+
+def refresh(users):
     result = default_result.copy()
-    users = User.query.all()
+    outcomes = OutcomeWriter('reauth')
+    log = RunLog(logger, 'Reauth')
     for user in users:
+        status, started = None, monotonic()
         try:
             provider = current_app.providers[user.provider]
             ids = provider.tokenize(user.refresh, refresh=True)
+            status = 200
 
             user.access = ids['access_token']
             user.refresh = ids['refresh_token']
 
             delta = timedelta(seconds=ids['expires_in'])
             user.expires = datetime.utcnow() + delta
+            user.recover()
 
             db.session.add(user)
             db.session.commit()
         except TokenError as e:
+            status = e.status
             result['failed'] += 1
-            logger.warning(f'Reauth failed: {user}, status={e}')
+            log.failure(user, user.provider, e)
+            backoff(user, e)
         except Exception as e:
             result['failed'] += 1
-            logger.exception(f'Reauth failed: {user}, err={e}', exc_info=1)
+            log.error(user, user.provider, e)
         else:
             result['success'] += 1
-            logger.info(f'Reauth success: {user}')
+            log.success(user, user.provider, status)
         finally:
             result['total'] += 1
+            outcomes.add(
+                user.uniq, user.provider, status, monotonic() - started,
+                owner=user.id)
 
+    outcomes.flush()
+    log.summary()
     return result
 
 
-@celery.task
-def push():
+def pending():
+    return Resume.query.join(User).filter(
+        Resume.enabled.is_(True), Resume.due(), User.quarantined.is_(False))
+
+
+def publish(resumes):
     result = default_result.copy()
-    resumes = Resume.query.filter_by(enabled=True).all()
+    outcomes = OutcomeWriter('push')
+    log = RunLog(logger, 'Push')
     for resume in resumes:
+        status, started = None, monotonic()
         try:
             provider = current_app.providers[resume.owner.provider]
-            provider.push(token=resume.owner.access, resume=resume.uniq)
+            status = provider.push(
+                token=resume.owner.access, resume=resume.uniq)
         except PushError as e:
+            status = e.status
             result['failed'] += 1
-            logger.warning(f'Push failed: {resume}, status={e}')
+            log.failure(resume, resume.owner.provider, e)
+            backoff(resume, e)
         except Exception as e:
             result['failed'] += 1
-            logger.exception(f'Push failed: {resume}, err={e}', exc_info=1)
+            log.error(resume, resume.owner.provider, e)
         else:
             result['success'] += 1
-            logger.info(f'Push success: {resume}')
+            log.success(resume, resume.owner.provider, status)
+            if resume.failures:
+                resume.recover()
+                db.session.add(resume)
+                db.session.commit()
         finally:
             result['total'] += 1
+            outcomes.add(
+                resume.uniq, resume.owner.provider, status,
+                monotonic() - started, owner=resume.user_id)
 
+    outcomes.flush()
+    log.summary()
     return result
+
+
+def dispatch(lo=0, hi=SLOTS):
+    partitions = current_app.config['PARTITIONS']
+    if partitions < 2:
+        return push_partition(0, lo, hi)
+
+    owners = membership().owners()
+    for partition in range(partitions):
+        send_partition(partition, lo, hi, owners.get(partition))
+    logger.info(f'Push dispatched: {len(owners)}/{partitions} owned')
+    return {'partitions': partitions, 'owned': len(owners)}
+
+
+def send_partition(partition, lo, hi, owner):
+    """Sends to the owner's queue, expires if the owner is gone for good"""
+    push_partition.apply_async(
+        (partition, lo, hi, owner), queue=queue(owner) if owner else None,
+        expires=current_app.config['PUSH_PERIOD'])
+
+
+def membership(node=None):
+    return Membership(
+        current_app.redis, node, current_app.config['PARTITIONS'],
+        current_app.config['PARTITION_TTL'])
+
+
+@celery.task
+def push():
+    return dispatch()
+
+
+@celery.task
+def push_slice():
+    """Pushes the slices due since the last dispatched one, a tick that
+    runs late catches up on the one it missed, the next finds none due"""
+    slices = current_app.config['PUSH_SLICES']
+    period = current_app.config['PUSH_PERIOD']
+    due = int(time() // (period / slices)) % slices
+
+    pipe = current_app.redis.pipeline()
+    pipe.getset('push:slice', due)
+    pipe.expire('push:slice', int(period))
+    last, _ = pipe.execute()
+    missed = 1 if last is None else (due - int(last)) % slices
+
+    results = []
+    for index in range(due - missed + 1, due + 1):
+        index %= slices
+        results.append(dispatch(
+            index * SLOTS // slices, (index + 1) * SLOTS // slices))
+    return results
+
+
+@celery.task
+def push_resume(resume_id):
+    resume = pending().filter(Resume.id == resume_id).first()
+    return publish([resume] if resume else [])
+
+
+@celery.task
+def push_partition(partition, lo=0, hi=SLOTS, node=None):
+    """Pushes a partition's resumes, one sent to a node that no longer
+    holds the partition lease follows the partition to its new owner"""
+    oneshot = Lease(  # taken by manage.py push, see batch.leased
+        current_app.redis, 'task:push', current_app.config['TASK_LEASE_TTL'])
+    if oneshot.holder():
+        logger.warning(f'Push skipped, one-shot push is running: {oneshot}')
+        return {'skipped': True}
+    if node is not None:
+        owner = membership().owners().get(partition)
+        if owner != node:
+            logger.warning(
+                f'Push re-routed: partition={partition}, {node} -> {owner}')
+            send_partition(partition, lo, hi, owner)
+            return {'rerouted': owner}
+    return push_owned(partition, lo, hi)
+
+
+@guarded('push:{partition}:{lo}', 'PUSH_PERIOD')
+def push_owned(run, partition, lo, hi):
+    resumes = pending().filter(Resume.slot >= lo, Resume.slot < hi)
+    partitions = current_app.config['PARTITIONS']
+    if partitions > 1:
+        resumes = resumes.filter(Resume.slot % partitions == partition)
+    return publish(keyset(run, resumes, Resume.id))
+
+
+@signals.worker_process_init.connect
+def warm_up(**kwargs):
+    if current_app.config['WARMUP']:
+        from .warmup import warm
+        warm(current_app, paths=False)
+
+
+@signals.worker_ready.connect
+def join_partitions(sender, **kwargs):
+    bulk = current_app.config['QUEUE_BULK']
+    if current_app.config['PARTITIONS'] < 2 or \
+            bulk not in sender.app.amqp.queues.consume_from:
+        return
+
+    node = membership(sender.hostname)
+    sender.add_task_queue(queue(node.node))
+    stopped = Event()
+
+    def heartbeat():
+        while True:
+            try:
+                owned = node.heartbeat()
+            except RedisError as e:
+                logger.warning(f'Partitions heartbeat failed: {e}')
+            else:
+                logger.debug(f'Partitions owned: {sorted(owned)}')
+            if stopped.wait(node.ttl / 3):
+                return node.leave()
+
+    @signals.worker_shutdown.connect(weak=False)
+    def leave_partitions(**kwargs):
+        stopped.set()
+
+    Thread(target=heartbeat, daemon=True).start()
+
+
+@celery.task
+@guarded('history', 'HISTORY_PRUNE_PERIOD')
+def history(run):
+    deleted = prune(current_app.config['HISTORY_RETENTION'])
+    logger.info(f'History pruned: {deleted} rows')
+    return {'deleted': deleted}
@@ -0,0 +1,99 @@
+from time import monotonic
+
+from flask import g, request, has_request_context, current_app
+from redis import Redis
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import providers
+
+
+KINDS = ('db', 'provider', 'redis')
+
+
+def track(kind, elapsed):
+    if has_request_context() and 'timings' in g:
+        g.timings[kind] += elapsed
+
+
+def timed(kind, func):
+    def wrapper(*args, **kwargs):
+        started = monotonic()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            track(kind, monotonic() - started)
+    return wrapper
+
+
+class TimedRedis(Redis):
+    """Counts commands and pipelines, which bypass execute_command"""
+
+    def execute_command(self, *args, **kwargs):
+        return timed('redis', super().execute_command)(*args, **kwargs)
+
+    def pipeline(self, *args, **kwargs):
+        pipe = super().pipeline(*args, **kwargs)
+        pipe.execute = timed('redis', pipe.execute)
+        return pipe
+
+
+def before_cursor(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('timing', []).append(monotonic())
+
+
+def after_cursor(conn, cursor, statement, parameters, context, executemany):
+    track('db', monotonic() - conn.info['timing'].pop())
+
+
+def cursor_error(context):
+    timing = context.connection.info.get('timing') \
+        if context.connection is not None else None
+    if timing:
+        timing.pop()
+
+
+def observe_provider(provider, method, status, elapsed):
+    track('provider', elapsed)
+
+
+def start_request():
+    g.timings = dict.fromkeys(KINDS, 0)
+    g.started = monotonic()
+
+
+def finish_request(response):
+    timings = g.get('timings')
+    if timings is None:
+        return response
+
+    timings['total'] = monotonic() - g.started
+    response.headers['Server-Timing'] = ', '.join(
+        f'{kind};dur={value * 1000:.1f}' for kind, value in timings.items())
+
+    fields = ' '.join(
+        f'{kind}={value * 1000:.1f}' for kind, value in timings.items())
+    current_app.logger.info(
+        f'Timing: method={request.method} path={request.path} '
+        f'status={response.status_code} {fields}')
+
+    return response
+
+
+def install(app, cache):
+    app.redis = TimedRedis(connection_pool=app.redis.connection_pool)
+
+    backend = app.extensions['cache'][cache]
+    client = getattr(backend, '_client', None)
+    if isinstance(client, Redis):
+        backend._client = TimedRedis(connection_pool=client.connection_pool)
+
+    if observe_provider not in providers.hooks:
+        providers.hooks.append(observe_provider)
+
+    event.listen(Engine, 'before_cursor_execute', before_cursor)
+    event.listen(Engine, 'after_cursor_execute', after_cursor)
+    event.listen(Engine, 'handle_error', cursor_error)
+
+    app.before_request(start_request)
+    app.after_request(finish_request)
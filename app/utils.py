@@ -1,24 +1,131 @@
+from math import ceil
+from time import time
+from uuid import uuid4
 from functools import wraps
+from threading import local
 from importlib import import_module
 
 from cerberus import Validator
 from flask import current_app, abort, request, jsonify
-from werkzeug.exceptions import HTTPException
+from flask_jwt_extended import get_jwt_identity
+from redis import RedisError
+from werkzeug.exceptions import HTTPException, TooManyRequests
 
 
 def validation_required(schema):
+    schema = Validator(schema).schema  # checked and compiled once
+    validators = local()  # validators keep per-document state
+
     def wrapper(func):
         @wraps(func)
         def decorator(*args, **kwargs):
-            validator = Validator(schema)
-            normalized = validator.normalized(request.get_json())
-            if not validator.validate(normalized):
+            validator = getattr(validators, 'validator', None)
+            if validator is None:
+                validator = validators.validator = Validator(schema)
+            if not validator.validate(request.get_json()):
                 return abort(400, validator.errors)
             return func(*args, **kwargs)
         return decorator
     return wrapper
 
 
+def rate_limited(setting):
+    """Sliding window limits per JWT identity and per client IP, setting
+    names a (requests, seconds) config value"""
+    def wrapper(func):
+        @wraps(func)
+        def decorator(*args, **kwargs):
+            limit, window = current_app.config[setting]
+            retry_after = throttle(request.endpoint, limit, window)
+            if retry_after:
+                e = TooManyRequests('Rate limit exceeded')
+                e.retry_after = retry_after
+                raise e
+            return func(*args, **kwargs)
+        return decorator
+    return wrapper
+
+
+def throttle(scope, limit, window):
+    """Counts the request in the identity's and the IP's windows, returns
+    seconds to wait when either is over its limit"""
+    limits = {f'ip:{request.remote_addr}':
+              limit * current_app.config['RATELIMIT_IP_SHARE']}
+    identity = get_jwt_identity()
+    if identity:
+        limits[f'user:{identity}'] = limit
+    keys = {f'ratelimit:{scope}:{client}': n for client, n in limits.items()}
+    now, member = time(), uuid4().hex
+    try:
+        pipe = current_app.redis.pipeline()
+        for key in keys:
+            pipe.zremrangebyscore(key, 0, now - window)
+            pipe.execute_command('ZADD', key, now, member)
+            pipe.zcard(key)
+            pipe.zrange(key, 0, 0, withscores=True)
+            pipe.expire(key, ceil(window))
+        results = pipe.execute()
+        oldest = [first[0][1] for (_, _, count, first, _), n in zip(
+            zip(*[iter(results)] * 5), keys.values()) if count > n]
+        if not oldest:
+            return 0
+        pipe = current_app.redis.pipeline()
+        for key in keys:
+            pipe.zrem(key, member)  # rejected calls don't count
+        pipe.execute()
+    except RedisError as e:
+        current_app.logger.warning(f'Rate limit skipped: {scope}, err={e}')
+        return 0
+    return max(ceil(max(oldest) + window - now), 1)
+
+
+def conditional(etag):
+    def wrapper(func):
+        @wraps(func)
+        def decorator(*args, **kwargs):
+            tag = etag()
+            if tag and request.if_none_match.contains(tag):
+                response = current_app.response_class(status=304)
+                response.set_etag(tag)
+                return response
+
+            response = current_app.make_response(func(*args, **kwargs))
+            if response.status_code == 200:
+                tag = etag()
+                if tag:
+                    response.set_etag(tag)
+            return response
+        return decorator
+    return wrapper
+
+
+def resume_version(user_id):
+    try:
+        version = current_app.redis.get(f'resume:version:{user_id}')
+    except RedisError:
+        return None
+    window = int(time() // current_app.config['RESUME_ETAG_TTL'])
+    return f'{user_id}.{int(version or 0)}.{window}'
+
+
+def bump_resume_version(*user_ids):
+    try:
+        pipe = current_app.redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.incr(f'resume:version:{user_id}')
+        pipe.execute()
+    except RedisError as e:
+        current_app.logger.warning(f'Resume version bump failed: {e}')
+
+
+def enqueue(task, *args):
+    """Sends a task by name, web workers don't import app.tasks"""
+    try:
+        current_app.celery.send_task(f'app.tasks.{task}', args, retry=False)
+    except Exception as e:
+        current_app.logger.warning(f'Enqueue failed: {task}{args}, err={e}')
+
+
 def json_in_body():
     data_methods = ['POST', 'PUT', 'PATCH', 'DELETE']
     if request.method in data_methods and not request.is_json:
@@ -31,9 +138,13 @@ def jsonify_error(e):
         return abort(500, 'Unexpected error')
 
     msg = {'status': e.code, 'message': e.description, 'error': e.name}
+    headers = {}
     if e.code == 405:
         msg.update({'allowed': e.valid_methods})
-    return jsonify(msg), e.code
+    if e.code == 429 and getattr(e, 'retry_after', None):
+        msg.update({'retry_after': e.retry_after})
+        headers['Retry-After'] = e.retry_after
+    return jsonify(msg), e.code, headers
 
 
 def jsonify_jwt_error(jwt):
@@ -48,6 +159,15 @@ def jsonify_jwt_error(jwt):
     jwt.unauthorized_loader(lambda m: handler(m))
 
 
+def load_revocation(app, jwt):
+    from .revocation import Revocations
+    app.revoked = Revocations(
+        app.redis, app.config['JWT_REVOKED_CAPACITY'],
+        app.config['JWT_REVOKED_REFRESH'], app.logger)
+    jwt.token_in_blacklist_loader(
+        lambda token: token['jti'] in current_app.revoked)
+
+
 def load_provider(app, provider):
     if not getattr(app, 'providers', False):
         app.providers = {}
@@ -57,8 +177,12 @@ def load_provider(app, provider):
         try:
             mod = import_module(f'app.providers.{provider}')
             app.providers[provider] = mod.Provider(
-                name=provider,
-                redirect_uri=back_url, **app.config[provider.upper()])
+                name=provider, redirect_uri=back_url,
+                cache=getattr(app, 'redis', None),
+                cache_ttl=app.config['PROVIDER_CACHE_TTL'],
+                pool_size=app.config['PROVIDER_POOL'],
+                coalesce_ttl=app.config['PROVIDER_COALESCE'],
+                **app.config[provider.upper()])
         except Exception as e:
             app.logger.exception(f'Provider [{provider}] load failed: {e}')
         else:
@@ -121,3 +245,30 @@ def load_scout_apm(app, db, celery=False):
         logger.warning('Scout APM modules not found')
     else:
         logger.info('Scout APM initialized')
+
+
+def load_metrics(app, celery=False):
+    logger = _get_logger(app, celery)
+    try:
+        from .metrics import install
+        install(app, celery)
+    except ImportError:
+        logger.warning('Prometheus client not found')
+    else:
+        logger.info('Metrics initialized')
+
+
+def load_json(app):
+    from .encoding import JSONEncoder, JSONDecoder, orjson
+    app.json_encoder = JSONEncoder
+    app.json_decoder = JSONDecoder
+    if orjson is None:
+        app.logger.info('JSON initialized, orjson not found, using stdlib')
+    else:
+        app.logger.info('JSON initialized with orjson')
+
+
+def load_timing(app, cache):
+    from .timing import install
+    install(app, cache)
+    app.logger.info('Server-Timing initialized')
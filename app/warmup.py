@@ -0,0 +1,59 @@
+from time import monotonic
+
+from . import db
+
+
+def timed(app, step, func, *args):
+    started = monotonic()
+    try:
+        func(*args)
+    except Exception as e:
+        app.logger.warning(f'Warm-up [{step}] failed: {e}')
+    else:
+        app.logger.info(
+            f'Warm-up [{step}] done in {monotonic() - started:.3f}s')
+
+
+def database(count):
+    connections = [db.engine.connect() for _ in range(count)]
+    for connection in connections:
+        connection.execute('SELECT 1')
+    for connection in connections:
+        connection.close()  # back to the pool, still open
+
+
+def redis(app, count):
+    pool = app.redis.connection_pool
+    connections = [pool.get_connection('PING') for _ in range(count)]
+    try:
+        for connection in connections:
+            connection.send_command('PING')
+            connection.read_response()
+    finally:
+        for connection in connections:
+            pool.release(connection)
+
+
+def providers(app):
+    for provider in app.providers.values():
+        provider.preconnect()
+
+
+def prime(app):
+    client = app.test_client()
+    for path in app.config['WARMUP_PATHS']:
+        client.get(path)
+
+
+def warm(app, paths=True):
+    """Opens DB, Redis and provider connections, primes hot caches, then
+    marks the app ready, call after fork: connections are per process"""
+    count = app.config['WARMUP_CONNECTIONS']
+    with app.app_context():
+        db.engine.dispose()  # inherited from a preloading parent
+        timed(app, 'db', database, count)
+        timed(app, 'redis', redis, app, count)
+        timed(app, 'providers', providers, app)
+        if paths:
+            timed(app, 'cache', prime, app)
+    app.ready.set()
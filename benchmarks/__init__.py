@@ -0,0 +1,210 @@
+import tracemalloc
+from time import monotonic
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class Probe(object):
+    """Counts SQL statements with their time and tracks peak memory"""
+
+    def __init__(self, memory=True, snapshot=False):
+        self.memory = memory
+        self.statements = {}
+        self.elapsed = self.peak = self.snapshot = None
+        self._take_snapshot = snapshot
+
+    @property
+    def queries(self):
+        return sum(count for count, _ in self.statements.values())
+
+    @property
+    def query_seconds(self):
+        return sum(seconds for _, seconds in self.statements.values())
+
+    def _before(self, conn, cursor, statement, *args):
+        conn.info.setdefault('probe', []).append(monotonic())
+
+    def _after(self, conn, cursor, statement, *args):
+        elapsed = monotonic() - conn.info['probe'].pop()
+        count, seconds = self.statements.get(statement, (0, 0.0))
+        self.statements[statement] = (count + 1, seconds + elapsed)
+
+    def __enter__(self):
+        event.listen(Engine, 'before_cursor_execute', self._before)
+        event.listen(Engine, 'after_cursor_execute', self._after)
+        if self.memory:
+            tracemalloc.start()
+        self._started = monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = monotonic() - self._started
+        if self.memory:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            if self._take_snapshot:
+                self.snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        event.remove(Engine, 'before_cursor_execute', self._before)
+        event.remove(Engine, 'after_cursor_execute', self._after)
+
+    def report(self, latencies, count=None):
+        count = len(latencies) if count is None else count
+        return {
+            'count': count,
+            'seconds': round(self.elapsed, 3),
+            'throughput': round(count / self.elapsed, 1) if count else 0,
+            'p50': percentile(latencies, 0.5),
+            'p99': percentile(latencies, 0.99),
+            'queries': self.queries,
+            'query_seconds': round(self.query_seconds, 3),
+            'peak_memory': self.peak
+        }
+
+
+def seed(db, scale, providers, enabled=0.5, batch=10000):
+    from app.fake import Accounts
+    from app.models import User, Resume
+
+    accounts = Accounts()
+    now = datetime.utcnow()
+    expires = now + timedelta(days=14)
+    users, resumes, account, total = [], [], 0, 0
+
+    def flush():
+        if users:
+            db.session.execute(User.__table__.insert(), users)
+        if resumes:
+            db.session.execute(Resume.__table__.insert(), resumes)
+        db.session.commit()
+        users.clear()
+        resumes.clear()
+
+    while total < scale:
+        account += 1
+        users.append({
+            'id': account, 'uniq': f'user{account}@example.com',
+            'provider': providers[account % len(providers)],
+            'access': f'access-{account}-0', 'refresh': f'refresh-{account}-0',
+            'expires': expires, 'updated': now, 'failures': 0,
+            'quarantined': False
+        })
+        for resume in accounts.resume_ids(account)[:scale - total]:
+            resumes.append({
+                'uniq': str(resume), 'user_id': account,
+                'enabled': resume % 100 < enabled * 100, 'failures': 0,
+                'quarantined': False
+            })
+            total += 1
+        if len(resumes) >= batch:
+            flush()
+
+    flush()
+    return account, total
+
+
+def bench_task(task, memory=True):
+    from app import providers
+
+    marks = []
+    hook = lambda *args: marks.append(monotonic())  # noqa: E731
+    providers.hooks.append(hook)
+    try:
+        with Probe(memory) as probe:
+            result = task()
+    finally:
+        providers.hooks.remove(hook)
+
+    ticks = [probe._started] + marks
+    latencies = [round(b - a, 6) for a, b in zip(ticks, ticks[1:])]
+    return probe.report(latencies, count=result.get('total', len(marks)))
+
+
+def bench_endpoint(client, method, path, users, body=None, memory=True):
+    from flask_jwt_extended import create_access_token
+
+    tokens = [create_access_token(user_id) for user_id in users]
+    latencies = []
+    with Probe(memory) as probe:
+        for user_id, token in zip(users, tokens):
+            headers = {'Authorization': f'JWT {token}'}
+            started = monotonic()
+            rv = client.open(
+                path, method=method, headers=headers,
+                json=body(user_id) if body else None)
+            latencies.append(round(monotonic() - started, 6))
+            if rv.status_code != 200:
+                raise RuntimeError(f'{method} {path}: {rv.status_code}')
+    return probe.report(latencies)
+
+
+def run(scales, latency='fixed:0', requests=1000, memory=True,
+        fake_redis=True):
+    from app import db, __version__
+    from app.fake import Latency, FakeProvider
+    from app.models import Resume
+    from app import tasks
+
+    app = tasks.current_app
+    if fake_redis:  # task leases, rate limits and revocations need one
+        import fakeredis
+        app.redis = app.revoked.redis = fakeredis.FakeRedis()
+        app.celery.conf.broker_url = 'memory://'  # POST /resume enqueues
+    names = list(app.config['PROVIDERS'])
+    app.providers = {
+        name: FakeProvider(name, Latency.parse(latency)) for name in names}
+    client = app.test_client()
+
+    report = {'version': __version__, 'latency': latency, 'scales': {}}
+    for scale in scales:
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+
+        started = monotonic()
+        users, resumes = seed(db, scale, names)
+        sample = list(range(1, users + 1, max(users // requests, 1)))
+        sample = sample[:requests]
+
+        def first_resume(user_id):
+            resume = Resume.query.filter_by(user_id=user_id).first()
+            return {'uniq': resume.uniq}
+
+        results = {
+            'seed': {'users': users, 'resume': resumes,
+                     'seconds': round(monotonic() - started, 3)},
+            'GET /resume': bench_endpoint(
+                client, 'GET', '/resume', sample, memory=memory),
+            'POST /resume': bench_endpoint(
+                client, 'POST', '/resume', sample, first_resume, memory),
+            'push': bench_task(tasks.push, memory),
+            'reauth': bench_task(tasks.reauth, memory),
+            'cleanup': bench_task(tasks.cleanup, memory)
+        }
+        report['scales'][str(scale)] = results
+
+    return report
+
+
+def compare(old, new):
+    lines = []
+    keys = ('throughput', 'p50', 'p99', 'queries', 'peak_memory')
+    for scale, phases in new['scales'].items():
+        for phase, result in phases.items():
+            before = old.get('scales', {}).get(scale, {}).get(phase, {})
+            for key in keys:
+                if result.get(key) is None or not before.get(key):
+                    continue
+                change = (result[key] - before[key]) / before[key] * 100
+                lines.append(
+                    f'{scale:>8} {phase:<14} {key:<12} '
+                    f'{before[key]:>12} -> {result[key]:<12} {change:+.1f}%')
+    return lines
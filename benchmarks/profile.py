@@ -0,0 +1,116 @@
+import io
+import sys
+import pstats
+import cProfile
+from uuid import uuid4
+from unittest import mock
+from collections import Counter
+from threading import Thread, Event, get_ident
+
+from . import Probe
+
+
+class Sampler(Thread):
+    """Samples a thread's stack, output is flamegraph.pl collapsed format"""
+
+    def __init__(self, thread_id, interval=0.005):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                where = f'{code.co_filename}:{code.co_firstlineno}'
+                stack.append(f'{code.co_name} ({where})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def write(self, output):
+        for stack, count in self.stacks.most_common():
+            output.write(f'{stack} {count}\n')
+
+
+def profile(func, echo=print, top=20, flamegraph=None, interval=0.005):
+    sampler = Sampler(get_ident(), interval) if flamegraph else None
+    profiler = cProfile.Profile()
+
+    with Probe(memory=True, snapshot=True) as probe:
+        if sampler:
+            sampler.start()
+        profiler.enable()
+        try:
+            result = func()
+        finally:
+            profiler.disable()
+            if sampler:
+                sampler.stop()
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats('cumulative').print_stats(top)
+    echo(f'== Hot functions ({probe.elapsed:.3f} sec total)')
+    echo(stream.getvalue())
+
+    echo(f'== SQL: {probe.queries} statements, {probe.query_seconds:.3f} sec')
+    statements = sorted(
+        probe.statements.items(), key=lambda i: i[1][1], reverse=True)
+    for statement, (count, seconds) in statements[:top]:
+        text = ' '.join(statement.split())[:100]
+        echo(f'{count:>8} {seconds * 1000:>10.1f} ms  {text}')
+
+    echo(f'\n== Allocations: peak {probe.peak / 1024:.1f} KiB')
+    for stat in probe.snapshot.statistics('lineno')[:top]:
+        size, count = stat.size / 1024, stat.count
+        echo(f'{size:>10.1f} KiB {count:>8}  {stat.traceback}')
+
+    if sampler:
+        sampler.write(flamegraph)
+        echo(f'\n== Flamegraph: {sum(sampler.stacks.values())} samples')
+
+    return result
+
+
+def task(tasks, name):
+    """Task body over all partitions under its own lease, so a live
+    Celery run neither skips it nor shares its checkpoint"""
+    from app.locks import Checkpoint
+    from app.models import SLOTS
+    app = tasks.current_app
+    if name == 'push':
+        body, args = tasks.push_owned.__wrapped__, (0, 0, SLOTS)
+    else:
+        body, args = getattr(tasks, name).run.__wrapped__, ()
+
+    def run():
+        ttl = app.config['TASK_LEASE_TTL']
+        checkpoint = Checkpoint(
+            app.redis, f'profile:{name}:{uuid4().hex}', ttl, ttl)
+        checkpoint.start()
+        try:
+            with mock.patch.dict(app.config, {'PARTITIONS': 1}):
+                return body(checkpoint, *args)
+        finally:
+            checkpoint.finish()
+    return run
+
+
+def rolled_back(db, func):
+    """Runs func with commits turned into flushes, rolls all back after"""
+    def run():
+        with mock.patch.object(db.session, 'commit', db.session.flush):
+            try:
+                return func()
+            finally:
+                db.session.rollback()
+    return run
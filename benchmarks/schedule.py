@@ -0,0 +1,161 @@
+import heapq
+from time import time, monotonic
+from datetime import datetime
+from contextlib import ExitStack
+from collections import Counter, defaultdict
+from unittest import mock
+
+from . import percentile, seed
+
+
+class Clock(object):
+    """Virtual time, provider latency advances it instead of sleeping"""
+
+    def __init__(self, start=None):
+        self.now = time() if start is None else start
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def datetime(self):
+        clock = self
+
+        class VirtualDatetime(datetime):
+
+            @classmethod
+            def utcnow(cls):
+                return datetime.utcfromtimestamp(clock.now)
+
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.fromtimestamp(clock.now, tz)
+
+        return VirtualDatetime
+
+
+class Sender(object):
+    """Collects what setup_periodic_tasks registers with Celery beat"""
+
+    def __init__(self):
+        self.schedule = []
+
+    def add_periodic_task(self, period, signature):
+        self.schedule.append((period, signature))
+
+
+def periodic(tasks):
+    sender = Sender()
+    tasks.setup_periodic_tasks(sender)
+    return sender.schedule
+
+
+def concurrency(intervals):
+    edges = sorted([(start, 1) for start, _ in intervals] +
+                   [(end, -1) for _, end in intervals])
+    peak = current = 0
+    for _, step in edges:
+        current += step
+        peak = max(peak, current)
+    return peak
+
+
+def simulate(scale=1000, days=1.0, latency='fixed:0.3', config=None,
+             seed_value=1):
+    """Runs the beat schedule of app.tasks over virtual days against an
+    in-memory DB, fakeredis and fake providers, returns a report"""
+    import fakeredis
+    from app import db, tasks, history, models, providers
+    from app.fake import Latency, FakeProvider
+    from app.models import Outcome
+
+    app = tasks.current_app
+    overrides = dict(config or {}, SQLALCHEMY_DATABASE_URI='sqlite://')
+    clock = Clock()
+    started, end = clock.now, clock.now + days * 86400
+    calls = []
+
+    def hook(provider, method, status, elapsed):
+        calls.append((clock.now, method))
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.dict(app.config, overrides))
+        virtual = clock.datetime()
+        for module in (tasks, history, models):
+            stack.enter_context(mock.patch.object(module, 'datetime', virtual))
+        stack.enter_context(mock.patch.object(tasks, 'time', clock.time))
+        stack.enter_context(mock.patch.object(providers, 'hooks', [hook]))
+
+        app.redis = fakeredis.FakeRedis()
+        names = list(app.config['PROVIDERS'])
+        app.providers = {name: FakeProvider(
+            name, Latency.parse(latency, seed_value), seed=seed_value,
+            sleep=clock.sleep) for name in names}
+
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        users, resumes = seed(db, scale, names)
+
+        schedule = periodic(tasks)
+        queue = [(started + period, i) for i, (period, _) in
+                 enumerate(schedule)]
+        heapq.heapify(queue)
+        runs, skipped, busy = defaultdict(list), Counter(), {}
+        wall = monotonic()
+
+        while queue and queue[0][0] < end:
+            at, i = heapq.heappop(queue)
+            period, signature = schedule[i]
+            heapq.heappush(queue, (at + period, i))
+            name = signature.task.rpartition('.')[2]
+            if busy.get(name, 0) > at:  # the task lease would skip it
+                skipped[name] += 1
+                continue
+            clock.now = at
+            signature()
+            busy[name] = clock.now
+            runs[name].append((at, clock.now))
+
+        gaps = []
+        pushed = db.session.query(Outcome.uniq, Outcome.created).filter(
+            Outcome.task == 'push', Outcome.status.between(200, 299)
+        ).order_by(Outcome.uniq, Outcome.created)
+        previous = (None, None)
+        for uniq, created in pushed:
+            if uniq == previous[0]:
+                gaps.append((created - previous[1]).total_seconds())
+            previous = (uniq, created)
+
+    hours, minutes, methods = Counter(), Counter(), Counter()
+    for at, method in calls:
+        hours[int((at - started) // 3600)] += 1
+        minutes[int((at - started) // 60)] += 1
+        methods[method] += 1
+
+    return {
+        'scale': {'users': users, 'resumes': resumes, 'days': days},
+        'wall_seconds': round(monotonic() - wall, 3),
+        'runs': {name: {
+            'count': len(intervals),
+            'skipped': skipped[name],
+            'max_seconds': round(max(e - s for s, e in intervals), 3),
+        } for name, intervals in runs.items()},
+        'peak_concurrency': concurrency(
+            [i for intervals in runs.values() for i in intervals]),
+        'provider_calls': {
+            'total': len(calls),
+            'methods': dict(methods),
+            'per_hour_max': max(hours.values(), default=0),
+            'per_hour_mean': round(len(calls) / max(days * 24, 1), 1),
+            'per_minute_max': max(minutes.values(), default=0)
+        },
+        'push_latency': {
+            'count': len(gaps),
+            'p50': percentile(gaps, 0.5),
+            'p95': percentile(gaps, 0.95),
+            'max': max(gaps, default=None)
+        }
+    }
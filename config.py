@@ -10,16 +10,56 @@ DEBUG = True if os.getenv('DEBUG') == 'True' else False
 
 FRONTEND_URL = os.getenv('FRONTEND_URL')
 
-CONTROLLERS = ['auth', 'resume', 'status']
+CONTROLLERS = ['auth', 'resume', 'status', 'metrics']
 PROVIDERS = ['headhunter', 'superjob']
 
 CLEANUP_PERIOD = 60*60*24  # sec
 REAUTH_PERIOD = 60*180  # sec
 PUSH_PERIOD = 60*30  # sec
+PUSH_SPREAD = True if os.getenv('PUSH_SPREAD') == 'True' else False
+PUSH_SLICES = 30  # spread mode pushes 1/PUSH_SLICES of resumes per tick
+
+PARTITIONS = int(os.getenv('PARTITIONS', 1))  # >1 splits push across nodes
+PARTITION_TTL = 30  # sec, node heartbeat and partition lease lifetime
+TASK_LEASE_TTL = 120  # sec, periodic task lease, renewed every ttl/3
+TASK_BATCH = 100  # rows between task checkpoints
+
+WARMUP = True if os.getenv('WARMUP') == 'True' else False
+WARMUP_CONNECTIONS = 2  # pre-opened DB and Redis connections per process
+WARMUP_PATHS = ['/stats', '/auth/providers']  # requested to prime caches
+
+RATELIMIT_RESUME = (30, 60)  # requests per window sec, per user
+RATELIMIT_LOGIN = (10, 60)
+RATELIMIT_IP_SHARE = 5  # an IP gets that many users' limit, e.g. NAT
+
+TASK_LOG = os.getenv('TASK_LOG', 'sampled')  # or full, a line per entity
+TASK_LOG_SAMPLE = float(os.getenv('TASK_LOG_SAMPLE', 0.01))  # successes
+TASK_LOG_ERRORS = 60  # sec, a repeated error signature is logged once per
+
+QUEUE_INTERACTIVE = 'interactive'  # user triggered pushes and token refresh
+QUEUE_BULK = 'bulk'  # periodic sweeps and cleanup, the default queue
+TASK_ROUTES = {
+    'app.tasks.push_resume': {'queue': QUEUE_INTERACTIVE},
+    'app.tasks.reauth_user': {'queue': QUEUE_INTERACTIVE},
+}
+
+BACKOFF_BASE = 60*30  # sec
+BACKOFF_MAX = 60*60*24  # sec
+BACKOFF_STATUSES = (400, 401, 403, 404)  # entity specific, not 429/5xx
+QUARANTINE_THRESHOLD = int(os.getenv('QUARANTINE_THRESHOLD', 10))
+
+HISTORY_BUFFER = 500  # rows
+HISTORY_FLUSH = 5  # sec
+HISTORY_RETENTION = int(os.getenv('HISTORY_RETENTION', 30))  # days
+HISTORY_PRUNE_PERIOD = 60*60  # sec
 
 JWT_HEADER_TYPE = 'JWT'
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', os.urandom(64))
 JWT_ACCESS_TOKEN_EXPIRES = os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 15)  # min
+JWT_BLACKLIST_ENABLED = True
+JWT_BLACKLIST_TOKEN_CHECKS = ['access']
+JWT_REVOKED_CAPACITY = 100000  # tokens, sizes the local Bloom filter
+JWT_REVOKED_REFRESH = 10  # sec, reload of revocations logged out elsewhere
 
 SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'postgres://')
 SQLALCHEMY_TRACK_MODIFICATIONS = False
@@ -31,14 +71,32 @@ CACHE_KEY_PREFIX = 'cache'
 CACHE_DEFAULT_TIMEOUT = 300
 CACHE_REDIS_URL = os.getenv('REDIS_URL', 'redis://')
 
+RESUME_ETAG_TTL = 60*5  # sec, bounds staleness of provider-side changes
+
+EVENTS_WAIT = 20  # sec, long poll, below gunicorn's worker timeout
+EVENTS_WAITERS = 2  # per web process, WEB_THREADS minus it serve the API
+EVENTS_BUFFER = 50  # recent outcomes kept per user
+EVENTS_TTL = 60*60*24  # sec
+
 SENTRY_DSN = os.getenv('SENTRY_DSN', None)
 
 SCOUT_KEY = os.getenv('SCOUT_KEY', None)
 SCOUT_NAME = 'pushresume-dev' if DEBUG else 'pushresume'
 SCOUT_MONITOR = True
 
+# set prometheus_multiproc_dir to aggregate gunicorn and celery children
+METRICS = True if os.getenv('METRICS') == 'True' else False
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9100))  # celery worker exporter
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', None)  # bearer for /metrics
+
+SERVER_TIMING = True if os.getenv('SERVER_TIMING') == 'True' else False
+
 # PROVIDERS SETTINGS
 
+PROVIDER_CACHE_TTL = REAUTH_PERIOD  # sec, cached resume lists by token
+PROVIDER_POOL = 10  # keep-alive connections per provider
+PROVIDER_COALESCE = 30  # sec, identical in-flight calls share one request
+
 HEADHUNTER = {
     'client_id': os.getenv('HH_CLIENT'),
     'client_secret': os.getenv('HH_SECRET'),
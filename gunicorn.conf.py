@@ -0,0 +1,14 @@
+import os
+
+# each worker serves WEB_THREADS requests at once, up to EVENTS_WAITERS of
+# them long polls of /resume/events, the rest are left for the API
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', 4))
+timeout = 30  # sec, EVENTS_WAIT stays below it
+
+
+def post_worker_init(worker):
+    app = worker.wsgi
+    if app.config['WARMUP']:
+        from app.warmup import warm
+        warm(app)
@@ -10,17 +10,272 @@ def cli():
 
 
 @cli.command(with_appcontext=False)
-def worker():
+@click.option('-Q', '--queues', default='interactive,bulk',
+              help='Comma separated queues to consume')
+@click.option('-c', '--concurrency', default=None, type=int,
+              help='Worker processes, defaults to CPU count')
+@click.option('-p', '--prefetch', default=4,
+              help='Prefetch multiplier, 1 suits long bulk sweeps')
+@click.option('-n', '--name', default=None, help='Node name, e.g. bulk@%h')
+@click.option('--beat/--no-beat', default=True,
+              help='Embed the periodic task scheduler, run it only once')
+def worker(queues, concurrency, prefetch, name, beat):
     """Start Celery worker"""
     from celery.bin import worker
     from app.tasks import celery
+    celery.conf.worker_prefetch_multiplier = prefetch
     worker.worker(app=celery).run(**{
-        'beat': True,
+        'queues': queues,
+        'concurrency': concurrency,
+        'hostname': name,
+        'beat': beat,
         'scheduler': 'redbeat.RedBeatScheduler',
         'loglevel': 'INFO',
     })
 
 
+@cli.command(with_appcontext=False)
+@click.option('-h', '--host', default='127.0.0.1', help='Bind address')
+@click.option('-p', '--port', default=5001, help='Bind port')
+@click.option('-l', '--latency', default='fixed:0',
+              help='fixed:SEC, uniform:MIN:MAX or lognormal:MEDIAN:SIGMA')
+@click.option('-e', '--errors', default=0.0, help='Share of 503 responses')
+@click.option('-t', '--throttle', default=0.0, help='Share of 429 responses')
+@click.option('-r', '--resumes', default=3, help='Max resumes per account')
+@click.option('-s', '--seed', default=None, type=int, help='Random seed')
+def fake(host, port, latency, errors, throttle, resumes, seed):
+    """Start fake HeadHunter/SuperJob API for load testing
+
+    Point providers to it, e.g. HH_BASE_URL=http://HOST:PORT/hh/,
+    HH_AUTH_URL=.../hh/authorize, HH_TOKEN_URL=.../hh/token,
+    SJ_BASE_URL=.../sj/, SJ_AUTH_URL=.../sj/authorize,
+    SJ_TOKEN_URL=.../sj/token, SJ_TOKEN_REFRESH_URL=.../sj/token/refresh
+    """
+    from app.fake import Latency, create_fake_app
+    app = create_fake_app(
+        latency=Latency.parse(latency, seed), error_rate=errors,
+        throttle_rate=throttle, resumes=resumes, seed=seed)
+    app.run(host=host, port=port, threaded=True)
+
+
+@cli.command(with_appcontext=False)
+@click.option('-s', '--scale', multiple=True, type=int, default=[10000],
+              help='Number of resumes to seed, repeatable')
+@click.option('-l', '--latency', default='fixed:0',
+              help='Stub provider latency, see fake command')
+@click.option('-n', '--requests', default=1000, help='Requests per endpoint')
+@click.option('-d', '--database', default='sqlite:///bench.db',
+              help='Scratch database, dropped and recreated')
+@click.option('-o', '--output', type=click.File('w'), help='Write JSON report')
+@click.option('-c', '--compare', type=click.File(), help='Previous report')
+@click.option('--memory/--no-memory', default=True, help='Trace peak memory')
+@click.option('--fake-redis/--redis', default=True,
+              help='In-process fakeredis or the one at REDIS_URL')
+def bench(scale, latency, requests, database, output, compare, memory,
+          fake_redis):
+    """Benchmark tasks and endpoints on synthetic data
+
+    Uses a scratch database, fake providers and, unless --redis is given,
+    fakeredis and an in-memory Celery broker instead of REDIS_URL.
+    """
+    import os
+    import json
+    import config
+    if database == config.SQLALCHEMY_DATABASE_URI:
+        raise click.BadParameter(
+            'Refusing to drop the configured DATABASE_URL', param_hint='-d')
+    os.environ['DATABASE_URL'] = config.SQLALCHEMY_DATABASE_URI = database
+    import benchmarks
+    report = benchmarks.run(scale, latency, requests, memory, fake_redis)
+    click.echo(json.dumps(report, indent=2))
+    if output:
+        json.dump(report, output, indent=2)
+    if compare:
+        for line in benchmarks.compare(json.load(compare), report):
+            click.echo(line)
+
+
+@cli.command(with_appcontext=False)
+@click.option('-s', '--scale', default=1000, help='Number of resumes to seed')
+@click.option('-d', '--days', default=1.0, help='Virtual days to run')
+@click.option('-l', '--latency', default='fixed:0.3',
+              help='Fake provider latency, see fake command')
+@click.option('-c', '--config', multiple=True,
+              help='KEY=VALUE override, e.g. PUSH_SPREAD=True, repeatable')
+@click.option('-o', '--output', type=click.File('w'), help='Write JSON report')
+def simulate(scale, days, latency, config, output):
+    """Run the periodic task schedule over virtual time
+
+    Uses an in-memory database, fakeredis and fake providers, reports
+    provider calls per hour, peak concurrency and push latency.
+    """
+    import json
+    from benchmarks.schedule import simulate
+
+    def literal(value):
+        if value in ('True', 'False'):
+            return value == 'True'
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+
+    overrides = {}
+    for item in config:
+        key, _, value = item.partition('=')
+        overrides[key] = literal(value)
+    report = simulate(scale, days, latency, overrides)
+    click.echo(json.dumps(report, indent=2))
+    if output:
+        json.dump(report, output, indent=2)
+
+
+@cli.command(with_appcontext=False)
+@click.argument('target')
+@click.option('-u', '--user', type=int, help='User id to sign requests')
+@click.option('-b', '--body', help='JSON body for the request')
+@click.option('-l', '--latency', default='fixed:0',
+              help='Stub provider latency, see fake command')
+@click.option('--stub/--no-stub', default=True, help='Use fake providers')
+@click.option('-t', '--top', default=20, help='Rows per section')
+@click.option('-f', '--flamegraph', type=click.File('w'),
+              help='Write collapsed stacks for flamegraph.pl')
+def profile(target, user, body, latency, stub, top, flamegraph):
+    """Profile a task (push, reauth, cleanup) or a request ('GET /resume')
+
+    Reads the configured database, writes are flushed, never committed,
+    and rolled back at the end. Fake providers also get fakeredis, so no
+    events or versions reach real users.
+    """
+    import json
+    from app import db
+    from benchmarks.profile import profile, task, rolled_back
+    if target in ('push', 'reauth', 'cleanup'):
+        from app import tasks
+        app, func = tasks.current_app, task(tasks, target)
+    else:
+        method, _, path = target.partition(' ')
+        if not path.startswith('/'):
+            raise click.BadParameter(f'Unknown target: {target}')
+        from flask_jwt_extended import create_access_token
+        app = create_app()
+        app.app_context().push()
+        headers = {}
+        if user is not None:
+            token = create_access_token(user)
+            headers['Authorization'] = f'JWT {token}'
+        client = app.test_client()
+        data = json.loads(body) if body else None
+
+        def func():
+            rv = client.open(path, method=method, headers=headers, json=data)
+            return f'{rv.status_code} {rv.get_data(as_text=True)[:200]}'
+
+    if stub:
+        import fakeredis
+        from app.fake import Latency, FakeProvider
+        app.providers = {name: FakeProvider(
+            name, Latency.parse(latency), strict=False)
+            for name in app.providers}
+        app.redis = app.revoked.redis = fakeredis.FakeRedis()
+        app.celery.conf.broker_url = 'memory://'
+
+    result = profile(rolled_back(db, func), click.echo, top, flamegraph)
+    click.echo(f'\n== Result: {result}')
+
+
+def oneshot(kind, workers, processes, provider, shard, batch, dry_run,
+            force):
+    from collections import Counter
+    from app import batch as job
+    if shard:
+        index, _, total = shard.partition('/')
+        if not (index.isdigit() and total.isdigit()) or \
+                int(index) >= int(total):
+            raise click.BadParameter(f'Expected INDEX/TOTAL: {shard}')
+        shard = int(index), int(total)
+
+    rows = job.select(kind, provider, shard)
+    by_provider = Counter(provider for _, provider in rows)
+    click.echo(f'{kind}: {len(rows)} due, ' + ', '.join(
+        f'{name}={count}' for name, count in sorted(by_provider.items())))
+    if dry_run or not rows:
+        return
+
+    mode = 'processes' if processes else 'threads'
+    click.echo(f'{kind}: running on {workers} {mode}, batch={batch}')
+    try:
+        with job.leased(kind, force) as lost:
+            result = job.run(
+                kind, [row_id for row_id, _ in rows], workers, processes,
+                batch, stop=lost)
+    except job.Busy as e:
+        raise click.ClickException(f'{e}, --force runs anyway')
+    click.echo(
+        f'{kind}: total={result["total"]} success={result["success"]} '
+        f'failed={result["failed"]} seconds={result["seconds"]} '
+        f'rate={result["rate"]}/s')
+    if lost.is_set():
+        raise click.ClickException(f'{kind}: lease lost, stopped early')
+
+
+def oneshot_options(func):
+    options = [
+        click.option('-w', '--workers', default=4, help='Pool size'),
+        click.option('--processes/--threads', default=False,
+                     help='Pool of forked processes or of threads'),
+        click.option('-p', '--provider', multiple=True,
+                     help='Only this provider, repeatable'),
+        click.option('-s', '--shard', help='INDEX/TOTAL, e.g. 0/4'),
+        click.option('-b', '--batch', default=100, help='Rows per pool job'),
+        click.option('-n', '--dry-run', is_flag=True,
+                     help='Only count what is due'),
+        click.option('-f', '--force', is_flag=True,
+                     help='Run even while the Celery task is running')]
+    for option in reversed(options):
+        func = option(func)
+    return func
+
+
+@cli.command(with_appcontext=False)
+@oneshot_options
+def push(**kwargs):
+    """Push due resumes once, without Celery (cron, catch-up)"""
+    oneshot('push', **kwargs)
+
+
+@cli.command(with_appcontext=False)
+@oneshot_options
+def reauth(**kwargs):
+    """Refresh due tokens once, without Celery (cron, catch-up)"""
+    oneshot('reauth', **kwargs)
+
+
+@cli.command()
+@click.argument('directory')
+@click.option('-r', '--redact', is_flag=True, help='Replace OAuth tokens')
+@click.option('-b', '--batch', default=1000, help='Rows per fetch')
+def export(directory, redact, batch):
+    """Stream users and resume to DIRECTORY as gzipped CSV"""
+    from app import dump
+    for table, count in dump.export(directory, redact, batch).items():
+        click.echo(f'{table}: {count} rows exported')
+
+
+@cli.command('import')
+@click.argument('directory')
+@click.option('-b', '--batch', default=1000, help='Rows per insert')
+def import_(directory, batch):
+    """Stream users and resume from DIRECTORY into empty tables"""
+    from app import dump
+    try:
+        counts = dump.load(directory, batch)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for table, count in counts.items():
+        click.echo(f'{table}: {count} rows imported')
+
+
 @cli.command(with_appcontext=False)
 @click.option('-o', '--output', default='html', help='Output dir for docs')
 def doc(output):
@@ -0,0 +1,50 @@
+"""resume slot
+
+Revision ID: 5e7d0c2b9f43
+Revises: c3f2a87d51e0
+Create Date: 2019-01-30 11:04:51.220386
+
+"""
+from zlib import crc32
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e7d0c2b9f43'
+down_revision = 'c3f2a87d51e0'
+branch_labels = None
+depends_on = None
+
+SLOTS = 3600  # must match app.models.SLOTS
+BATCH = 10000  # rows per backfill page and executemany
+
+
+def upgrade():
+    op.add_column('resume', sa.Column('slot', sa.SmallInteger(), nullable=True))
+
+    resume = sa.table('resume', sa.column('id'), sa.column('uniq'),
+                      sa.column('slot'))
+    update = resume.update().where(
+        resume.c.id == sa.bindparam('_id')).values(slot=sa.bindparam('_slot'))
+    conn = op.get_bind()
+    last = 0
+    while True:
+        rows = conn.execute(
+            sa.select([resume.c.id, resume.c.uniq]).where(resume.c.id > last)
+            .order_by(resume.c.id).limit(BATCH)).fetchall()
+        if not rows:
+            break
+        conn.execute(update, [
+            {'_id': id, '_slot': crc32(uniq.encode()) % SLOTS}
+            for id, uniq in rows])
+        last = rows[-1][0]
+
+    op.alter_column('resume', 'slot', nullable=False)
+    op.create_index(op.f('ix_resume_slot'), 'resume', ['slot'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_resume_slot'), table_name='resume')
+    op.drop_column('resume', 'slot')
@@ -0,0 +1,34 @@
+"""backoff
+
+Revision ID: 9a4c1e0b7d21
+Revises: 48c330bee89d
+Create Date: 2019-01-21 12:10:42.318514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c1e0b7d21'
+down_revision = '48c330bee89d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('users', 'resume'):
+        op.add_column(table, sa.Column(
+            'failures', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column(
+            'retry_at', sa.DateTime(), nullable=True))
+        op.add_column(table, sa.Column(
+            'quarantined', sa.Boolean(), nullable=False,
+            server_default=sa.false()))
+
+
+def downgrade():
+    for table in ('users', 'resume'):
+        op.drop_column(table, 'quarantined')
+        op.drop_column(table, 'retry_at')
+        op.drop_column(table, 'failures')
@@ -0,0 +1,80 @@
+import os
+import tempfile
+from threading import Event
+from unittest import mock
+
+from tests.test_tasks import TasksBase
+
+
+class BatchTest(TasksBase):
+
+    def setUp(self):
+        from app import batch
+        from app.fake import FakeProvider
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)  # threads share a file, not one :memory: connection
+        self.config = mock.patch.dict(self.tasks.current_app.config, {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.path}'})
+        self.config.start()
+        super().setUp()
+        self.batch = batch
+        self.providers = mock.patch.object(self.app, 'providers', {
+            name: FakeProvider(name, seed=1)
+            for name in ('headhunter', 'superjob')})
+        self.providers.start()
+
+    def fixtures(self):
+        from app import db
+        from benchmarks import seed
+        seed(db, 40, ['headhunter', 'superjob'], enabled=1)
+
+    def tearDown(self):
+        super().tearDown()
+        self.providers.stop()
+        self.config.stop()
+        os.remove(self.path)
+
+    def test_select_filters_and_shards(self):
+        due = self.batch.select('push')
+        self.assertEqual(len(due), 40)
+        superjob = self.batch.select('push', ['superjob'])
+        self.assertTrue(superjob)
+        self.assertEqual({provider for _, provider in superjob}, {'superjob'})
+        shards = [self.batch.select('push', shard=(i, 3)) for i in range(3)]
+        ids = sorted(row_id for shard in shards for row_id, _ in shard)
+        self.assertEqual(ids, sorted(row_id for row_id, _ in due))
+
+    def test_run_threads(self):
+        ids = [row_id for row_id, _ in self.batch.select('push')]
+        result = self.batch.run('push', ids, workers=3, batch=7)
+        self.assertEqual(result['total'], 40)
+        self.assertEqual(result['success'], 40)
+        from app.models import Outcome
+        pushed = Outcome.query.filter_by(task='push', status=204).count()
+        self.assertEqual(pushed, 40)
+
+    def test_refuses_while_sweep_runs(self):
+        from app.locks import Lease
+        sweep = Lease(self.app.redis, 'task:push:0:0', 60)
+        self.assertTrue(sweep.acquire())
+        with self.assertRaises(self.batch.Busy):
+            with self.batch.leased('push'):
+                pass
+        oneshot = Lease(self.app.redis, 'task:push', 60)
+        with self.batch.leased('push', force=True):
+            self.assertIsNotNone(oneshot.holder())
+            self.assertEqual(self.tasks.push_partition(0), {'skipped': True})
+        self.assertIsNone(oneshot.holder())
+
+    def test_stops_when_lease_lost(self):
+        ids = [row_id for row_id, _ in self.batch.select('push')]
+        stop = Event()
+        stop.set()  # lost before the first chunk finished
+        result = self.batch.run('push', ids, workers=1, batch=5, stop=stop)
+        self.assertLess(result['total'], 40)
+
+    def test_lost_lease_is_reported(self):
+        with mock.patch.dict(self.app.config, {'TASK_LEASE_TTL': 0.15}):
+            with self.batch.leased('reauth') as lost:
+                self.app.redis.delete('lease:task:reauth')
+                self.assertTrue(lost.wait(1))
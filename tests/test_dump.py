@@ -0,0 +1,65 @@
+import gzip
+import shutil
+import tempfile
+from datetime import datetime
+
+from tests import AppBase
+
+from app import db, dump
+from app.models import User, Resume
+
+
+class DumpTest(AppBase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        user = User(
+            uniq='user', provider='test', access='secret', refresh='r',
+            expires=datetime(2019, 1, 28, 10, 12, 43, 123456))
+        db.session.add(Resume(uniq='q1w2e3r4t5y6', enabled=True, owner=user))
+        db.session.add(Resume(uniq='y6t5r4e3w2q1', owner=user))
+        db.session.commit()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super().tearDown()
+
+    def reset(self):
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+
+    def test_roundtrip(self):
+        counts = dump.export(self.directory, batch=1)
+        self.assertEqual(counts, {'users': 1, 'resume': 2})
+        self.reset()
+
+        self.assertEqual(dump.load(self.directory, batch=1), counts)
+        user = User.query.one()
+        self.assertEqual(user.access, 'secret')
+        self.assertEqual(user.expires.microsecond, 123456)
+        self.assertIsNone(user.retry_at)
+        self.assertEqual(
+            [(r.uniq, r.enabled) for r in user.resume],
+            [('q1w2e3r4t5y6', True), ('y6t5r4e3w2q1', False)])
+        self.assertEqual(user.resume[0].slot, 1223)
+
+    def test_redact(self):
+        dump.export(self.directory, redact=True)
+        with gzip.open(dump.path(self.directory, User.__table__), 'rt') as f:
+            self.assertNotIn('secret', f.read())
+
+    def test_load_refuses_filled_tables(self):
+        dump.export(self.directory)
+        with self.assertRaisesRegex(ValueError, 'users is not empty'):
+            dump.load(self.directory)
+        self.assertEqual(Resume.query.count(), 2)
+
+    def test_load_refuses_unknown_columns(self):
+        dump.export(self.directory)
+        self.reset()
+        with gzip.open(dump.path(self.directory, User.__table__), 'wt') as f:
+            f.write('id,uniq) FROM STDIN; DROP TABLE users; --\n')
+        with self.assertRaisesRegex(ValueError, 'Unexpected users columns'):
+            dump.load(self.directory)
@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+
+from flask import Flask, request, jsonify
+
+from tests import AppBase
+
+from app.providers import Record
+from app.utils import load_json, validation_required
+
+
+class EncodingTest(AppBase):
+
+    def setUp(self):
+        app = Flask(__name__)
+        load_json(app)
+
+        @app.route('/echo', methods=['POST'])
+        @validation_required({'uniq': {'type': 'string', 'required': True}})
+        def echo():
+            return jsonify(request.get_json())
+
+        @app.route('/dates')
+        def dates():
+            return jsonify(b=1, a=datetime(2018, 8, 19, 14, 41, 52))
+
+        super().setUp(app)
+        self.client = app.test_client()
+
+    def test_datetime_keeps_http_date(self):
+        rv = self.client.get('/dates')
+        self.assertEqual(
+            rv.get_json(), {'a': 'Sun, 19 Aug 2018 14:41:52 GMT', 'b': 1})
+
+    def test_aware_datetime(self):
+        published = datetime(2018, 8, 19, 14, 41, 52, tzinfo=timezone.utc)
+        with self.app.test_request_context():
+            body = jsonify([published]).get_json()
+        self.assertEqual(body, ['Sun, 19 Aug 2018 14:41:52 GMT'])
+
+    def test_record(self):
+        record = Record('q1w2', 'John Doe', 'Proctologist',
+                        datetime(2018, 8, 19, 14, 41, 52), 'link', True)
+        with self.app.test_request_context():
+            body = jsonify([record]).get_json()
+        self.assertEqual(body, [{
+            'uniq': 'q1w2', 'name': 'John Doe', 'title': 'Proctologist',
+            'published': 'Sun, 19 Aug 2018 14:41:52 GMT', 'link': 'link',
+            'enabled': True}])
+
+    def test_request_roundtrip(self):
+        rv = self.client.post('/echo', json={'uniq': 'резюме'})
+        self.assertEqual(rv.get_json(), {'uniq': 'резюме'})
+
+    def test_validation(self):
+        self.assertEqual(self.client.post('/echo', json={}).status_code, 400)
+        rv = self.client.post(
+            '/echo', data='{"uniq": ', content_type='application/json')
+        self.assertEqual(rv.status_code, 400)
@@ -0,0 +1,80 @@
+import unittest
+from time import sleep, monotonic
+from datetime import datetime, timedelta
+from threading import Thread
+from unittest import mock
+
+from flask_jwt_extended import create_access_token
+
+from tests import AppBase
+
+from app import create_app
+from app.history import OutcomeWriter
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, 'fakeredis required')
+class EventsTest(AppBase):
+
+    def setUp(self):
+        import config
+        config.FRONTEND_URL = config.FRONTEND_URL or 'http://localhost'
+        app = create_app()
+        super().setUp(app)  # reloads config, expiry must be timedelta again
+        app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=15)
+        app.config['EVENTS_WAIT'] = 1
+        app.redis = fakeredis.FakeRedis()
+        self.client = app.test_client()
+        self.headers = {
+            'Authorization': f'JWT {create_access_token(identity=7)}'}
+
+    def publish(self, uniq, created, delay=0):
+        def run():
+            sleep(delay)
+            with self.app.app_context():
+                OutcomeWriter('push').notify([(7, {
+                    'task': 'push', 'uniq': uniq, 'provider': 'superjob',
+                    'status': 204, 'created': created})])
+        if not delay:
+            return run()
+        thread = Thread(target=run)
+        thread.start()
+        return thread
+
+    def events(self, since=None):
+        query = f'?since={since}' if since else ''
+        started = monotonic()
+        rv = self.client.get(f'/resume/events{query}', headers=self.headers)
+        self.assertEqual(rv.status_code, 200)
+        return rv.get_json(), monotonic() - started
+
+    def test_since(self):
+        self.publish('one', datetime(2019, 1, 28, 10))
+        self.publish('two', datetime(2019, 1, 28, 11))
+        events, _ = self.events()
+        self.assertEqual([e['uniq'] for e in events], ['one', 'two'])
+        events, _ = self.events(events[0]['created'])
+        self.assertEqual([e['uniq'] for e in events], ['two'])
+
+    def test_wakes_up(self):
+        thread = self.publish('one', datetime.utcnow(), delay=0.2)
+        events, elapsed = self.events('2019-01-01T00:00:00')
+        thread.join()
+        self.assertEqual([e['uniq'] for e in events], ['one'])
+        self.assertLess(elapsed, 0.9)
+
+    def test_times_out_empty(self):
+        events, elapsed = self.events()
+        self.assertEqual(events, [])
+        self.assertGreaterEqual(elapsed, 1)
+
+    def test_saturated_answers_at_once(self):
+        waiters = self.app.events_waiters
+        with mock.patch.object(waiters, 'acquire', return_value=False):
+            events, elapsed = self.events()
+        self.assertEqual(events, [])
+        self.assertLess(elapsed, 0.5)
@@ -0,0 +1,91 @@
+import json
+import unittest
+from threading import Thread
+
+from werkzeug.serving import make_server
+
+from app.fake import Latency, create_fake_app
+from app.providers import PushError, TokenError
+from app.providers import headhunter, superjob
+
+
+class Cache(dict):
+
+    def set(self, key, value, ex=None):
+        self[key] = value
+
+
+class FakeProviderTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fake = create_fake_app(resumes=3, seed=1)
+        cls.server = make_server('127.0.0.1', 0, cls.fake, threaded=True)
+        Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def provider(self, module, prefix, **kwargs):
+        return module.Provider(
+            name=prefix, redirect_uri='http://front/auth', client_id='id',
+            client_secret='secret', base_url=f'{self.url}/{prefix}/',
+            authorize_url=f'{self.url}/{prefix}/authorize',
+            access_token_url=f'{self.url}/{prefix}/token', **kwargs)
+
+    def check(self, provider):
+        ids = provider.tokenize('42', refresh=False)
+        self.assertEqual(provider.identity(ids['access_token']),
+                         'user42@example.com')
+
+        resumes = provider.fetch(ids['access_token'])
+        self.assertEqual(len(resumes), 1 + 42 % 3)
+
+        self.assertTrue(provider.push(ids['access_token'], resumes[0].uniq))
+        with self.assertRaises(PushError) as e:
+            provider.push(ids['access_token'], '9999')
+        self.assertEqual(e.exception.status, 404)
+
+        fresh = provider.tokenize(ids['refresh_token'], refresh=True)
+        self.assertNotEqual(fresh['access_token'], ids['access_token'])
+
+    def test_headhunter(self):
+        self.check(self.provider(headhunter, 'hh'))
+
+    def test_superjob(self):
+        self.check(self.provider(
+            superjob, 'sj', refresh_token_url=f'{self.url}/sj/token/refresh'))
+
+    def test_conditional(self):
+        cache = Cache()
+        provider = self.provider(headhunter, 'hh', cache=cache, cache_ttl=60)
+        token = provider.tokenize('7')['access_token']
+        resumes = provider.fetch(token)
+        self.assertEqual(len(cache), 1)
+
+        key, entry = next(iter(cache.items()))
+        cached = json.loads(entry)
+        cached['payload'] = cached['payload'][:1]
+        cache[key] = json.dumps(cached)
+        self.assertEqual(provider.fetch(token), resumes[:1])
+
+        self.fake.accounts.publish(70)
+        self.assertNotEqual(provider.fetch(token), resumes)
+
+    def test_errors(self):
+        with self.assertRaises(TokenError) as e:
+            self.provider(headhunter, 'hh').tokenize('access-1', refresh=True)
+        self.assertEqual(e.exception.status, 400)
+
+        throttled = create_fake_app(throttle_rate=1.0)
+        with throttled.test_client() as client:
+            rv = client.post('/hh/token', data={'code': '1'})
+        self.assertEqual(rv.status_code, 429)
+        self.assertEqual(rv.headers['Retry-After'], '1')
+
+    def test_latency(self):
+        self.assertEqual(Latency.parse('fixed:0.25').sample(), 0.25)
+        sample = Latency.parse('uniform:0.1:0.2', seed=1).sample()
+        self.assertTrue(0.1 <= sample <= 0.2)
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from tests import AppBase
+
+from app import db
+from app.history import OutcomeWriter, prune
+from app.models import Outcome
+
+
+class HistoryTest(AppBase):
+
+    def test_buffered(self):
+        writer = OutcomeWriter('push', size=3, interval=60)
+        writer.add('one', 'test', 204, 0.1)
+        writer.add('two', 'test', 404, 0.2)
+        self.assertEqual(Outcome.query.count(), 0)
+        writer.add('three', 'test', None, 0.3)
+        self.assertEqual(Outcome.query.count(), 3)
+        self.assertEqual(writer.flush(), 0)
+
+        outcome = Outcome.query.filter_by(uniq='two').one()
+        self.assertEqual(outcome.status, 404)
+        self.assertEqual(outcome.latency, 200)
+
+    def test_prune(self):
+        writer = OutcomeWriter('reauth')
+        writer.add('old', 'test', 200, 0)
+        writer.add('new', 'test', 200, 0)
+        writer.flush()
+        Outcome.query.filter_by(uniq='old').update(
+            {'created': datetime.utcnow() - timedelta(days=31)})
+        db.session.commit()
+
+        self.assertEqual(prune(days=30, batch=1), 1)
+        self.assertEqual([o.uniq for o in Outcome.query], ['new'])
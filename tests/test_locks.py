@@ -0,0 +1,36 @@
+import unittest
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from app.locks import Checkpoint
+
+
+@unittest.skipIf(fakeredis is None, 'fakeredis required')
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+
+    def checkpoint(self):
+        return Checkpoint(self.redis, 'test', ttl=60, period=600)
+
+    def test_finish_forgets_checkpoint(self):
+        run = self.checkpoint()
+        self.assertTrue(run.start())
+        self.assertTrue(run.save(42))
+        run.finish()
+        self.assertEqual(self.checkpoint().last(), 0)
+        self.assertTrue(self.checkpoint().start())
+
+    def test_expired_run_keeps_next_ones_checkpoint(self):
+        old, new = self.checkpoint(), self.checkpoint()
+        self.assertTrue(old.start())
+        self.redis.delete(old.lease.key)  # expired mid run
+        self.assertTrue(new.start())
+        self.assertTrue(new.save(42))
+        old.finish()
+        self.assertEqual(new.last(), 42)
+        self.assertEqual(new.lease.holder(), new.lease.owner)
@@ -0,0 +1,89 @@
+import unittest
+from unittest import mock
+
+from flask import g, request
+
+from tests import AppBase
+
+from app import create_app
+
+try:
+    from app import metrics
+    from prometheus_client import REGISTRY
+except ImportError:
+    metrics = None
+
+
+class MetricsBase(AppBase):
+
+    def setUp(self):
+        import config
+        config.FRONTEND_URL = config.FRONTEND_URL or 'http://localhost'
+        app = create_app()
+        super().setUp(app)
+        self.client = app.test_client()
+
+
+class MetricsEndpointTest(MetricsBase):
+
+    def test_disabled(self):
+        with mock.patch.dict(self.app.config, {'METRICS': False}):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    @unittest.skipIf(metrics is None, 'prometheus_client required')
+    def test_token_required(self):
+        config = {'METRICS': True, 'METRICS_TOKEN': 'secret'}
+        with mock.patch.dict(self.app.config, config):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            rv = self.client.get(
+                '/metrics', headers={'Authorization': 'Bearer wrong'})
+            self.assertEqual(rv.status_code, 403)
+            rv = self.client.get(
+                '/metrics', headers={'Authorization': 'Bearer secret'})
+            self.assertEqual(rv.status_code, 200)
+            self.assertIn(b'pushresume_provider_seconds', rv.data)
+
+    def test_no_token_configured(self):
+        config = {'METRICS': True, 'METRICS_TOKEN': None}
+        with mock.patch.dict(self.app.config, config):
+            rv = self.client.get(
+                '/metrics', headers={'Authorization': 'Bearer None'})
+            self.assertEqual(rv.status_code, 403)
+
+
+@unittest.skipIf(metrics is None, 'prometheus_client required')
+class MetricsTest(MetricsBase):
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_observe_provider(self):
+        from app import providers
+        from app.fake import FakeProvider
+        provider = FakeProvider('observed', strict=False)
+        labels = {'provider': 'observed', 'method': 'push'}
+        before = self.sample('pushresume_provider_seconds_count', **labels)
+        with mock.patch.object(
+                providers, 'hooks', [metrics.observe_provider]):
+            provider.push('access-1-0', resume='10')
+            provider.error_rate = 1.0
+            with self.assertRaises(providers.PushError):
+                provider.push('access-1-0', resume='10')
+        self.assertEqual(self.sample(
+            'pushresume_provider_seconds_count', **labels), before + 2)
+        for status in ('204', '503'):
+            self.assertEqual(self.sample(
+                'pushresume_provider_calls_total', status=status,
+                **labels), 1)
+
+    def test_queries_per_request(self):
+        with self.app.test_request_context('/stats'):
+            labels = {'endpoint': request.endpoint}
+            before = self.sample('pushresume_db_queries_count', **labels)
+            metrics.start_request()
+            for _ in range(3):
+                metrics.count_query(None, None, 'SELECT 1', (), None, False)
+            self.assertEqual(g.queries, 3)
+            metrics.finish_request(self.app.response_class())
+        self.assertEqual(
+            self.sample('pushresume_db_queries_count', **labels), before + 1)
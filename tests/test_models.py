@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+from tests import AppBase
+
+from app import db
+from app.models import SLOTS, User, Resume, slot_of
+
+
+class BackoffTest(AppBase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User(
+            uniq='user', provider='test', access='a', refresh='r',
+            expires=datetime.utcnow())
+        self.resume = Resume(uniq='resume', enabled=True, owner=self.user)
+        db.session.add(self.user)
+        db.session.commit()
+
+    def due(self):
+        return Resume.query.filter(Resume.due()).all()
+
+    def test_fail_delays(self):
+        self.resume.fail(base=60, limit=600, threshold=10)
+        db.session.commit()
+        self.assertEqual(self.resume.failures, 1)
+        self.assertFalse(self.resume.quarantined)
+        self.assertEqual(self.due(), [])
+
+    def test_fail_exponential_capped(self):
+        for _ in range(6):
+            self.resume.fail(base=60, limit=600, threshold=10)
+        delay = self.resume.retry_at - datetime.utcnow()
+        self.assertLessEqual(delay, timedelta(seconds=600))
+        self.assertGreater(delay, timedelta(seconds=590))
+
+    def test_quarantine(self):
+        for _ in range(3):
+            self.resume.fail(base=0, limit=0, threshold=3)
+        db.session.commit()
+        self.assertTrue(self.resume.quarantined)
+        self.assertEqual(self.due(), [])
+
+    def test_recover(self):
+        for _ in range(3):
+            self.resume.fail(base=60, limit=600, threshold=3)
+        self.resume.recover()
+        db.session.commit()
+        self.assertEqual(self.resume.failures, 0)
+        self.assertEqual(self.due(), [self.resume])
+
+
+class SlotTest(AppBase):
+
+    def test_slot_is_stable_hash(self):
+        user = User(
+            uniq='user', provider='test', access='a', refresh='r',
+            expires=datetime.utcnow())
+        resume = Resume(uniq='q1w2e3r4t5y6', owner=user)
+        db.session.add(user)
+        db.session.commit()
+        self.assertEqual(resume.slot, slot_of('q1w2e3r4t5y6'))
+        self.assertEqual(resume.slot, 1223)
+        self.assertTrue(0 <= resume.slot < SLOTS)
+
+
+class UpsertTest(AppBase):
+
+    def upsert(self, access):
+        return User.upsert(
+            uniq='user', provider='test', access=access, refresh='r',
+            expires=datetime.utcnow())
+
+    def test_insert_then_update(self):
+        user_id = self.upsert('a1')
+        self.assertEqual(self.upsert('a2'), user_id)
+        self.assertEqual(User.query.count(), 1)
+        self.assertEqual(User.query.get(user_id).access, 'a2')
+
+    def test_recovers_user_and_resumes(self):
+        user = User.query.get(self.upsert('a1'))
+        resume = Resume(uniq='resume', enabled=True, owner=user)
+        for entity in (user, resume):
+            for _ in range(3):
+                entity.fail(base=60, limit=600, threshold=3)
+        db.session.commit()
+
+        self.upsert('a2')
+        db.session.expire_all()
+        self.assertFalse(user.quarantined)
+        self.assertEqual(resume.failures, 0)
+        self.assertIsNone(resume.retry_at)
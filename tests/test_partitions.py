@@ -0,0 +1,56 @@
+import unittest
+from unittest import mock
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from app.partitions import Membership, assign
+
+
+class AssignTest(unittest.TestCase):
+
+    def test_balanced(self):
+        owners = assign(['one', 'two', 'three'], 300)
+        self.assertEqual(sorted(owners), list(range(300)))
+        counts = [list(owners.values()).count(n) for n in set(owners.values())]
+        self.assertEqual(len(counts), 3)
+        self.assertTrue(all(60 < count < 140 for count in counts))
+
+    def test_stable_when_node_leaves(self):
+        before = assign(['one', 'two', 'three'], 64)
+        after = assign(['one', 'three'], 64)
+        for partition, node in before.items():
+            if node != 'two':
+                self.assertEqual(after[partition], node)
+
+    def test_no_nodes(self):
+        self.assertEqual(assign([], 8), {})
+
+
+@unittest.skipIf(fakeredis is None, 'fakeredis required')
+class MembershipTest(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+
+    def member(self, node):
+        return Membership(self.redis, node, partitions=8, ttl=30)
+
+    def test_nodes_share_partitions(self):
+        one, two = self.member('one'), self.member('two')
+        one.heartbeat()
+        two.heartbeat()
+        owned = one.heartbeat() | two.heartbeat()
+        self.assertEqual(owned, set(range(8)))
+        self.assertFalse(one.owned & two.owned)
+        self.assertEqual(len(one.owners()), 8)
+
+    def test_liveness_uses_redis_clock(self):
+        one, two = self.member('one'), self.member('two')
+        one.heartbeat()
+        with mock.patch.object(two, 'now', return_value=one.now() + 60):
+            self.assertEqual(two.nodes(), [])  # one's heartbeat expired
+        one.heartbeat()
+        self.assertEqual(two.nodes(), ['one'])
@@ -0,0 +1,32 @@
+from unittest import mock
+
+from tests.test_tasks import TasksBase
+
+
+class ProfileTest(TasksBase):
+
+    def profile(self, name):
+        from app import db
+        from app.fake import FakeProvider
+        from benchmarks.profile import task, rolled_back
+        providers = {'superjob': FakeProvider('superjob', strict=False)}
+        with mock.patch.object(self.app, 'providers', providers):
+            return rolled_back(db, task(self.tasks, name))()
+
+    def test_writes_are_rolled_back(self):
+        from app import db
+        from app.models import Outcome, Resume, User
+        self.resume.enabled = False
+        db.session.commit()
+        self.assertEqual(self.profile('reauth')['success'], 1)
+        self.assertEqual(self.profile('cleanup')['success'], 1)
+        self.assertEqual(User.query.one().refresh, 'r')
+        self.assertEqual(Resume.query.count(), 1)
+        self.assertEqual(Outcome.query.count(), 0)
+
+    def test_push_ignores_live_lease(self):
+        from app.locks import Checkpoint
+        live = Checkpoint(self.app.redis, 'push:0:0', 60, 600)
+        self.assertTrue(live.start())
+        with mock.patch.dict(self.app.config, {'PARTITIONS': 4}):
+            self.assertEqual(self.profile('push')['success'], 1)
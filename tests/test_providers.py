@@ -0,0 +1,131 @@
+import unittest
+from time import sleep
+from threading import Thread
+from unittest import mock
+from datetime import datetime, timedelta, timezone
+
+from app.providers import BaseProvider, Record, ResumeError, parse_timestamp
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class ParseTimestampTest(unittest.TestCase):
+
+    def test_matches_strptime(self):
+        for value in ('2018-08-19T17:41:52+0300', '2018-08-19T17:41:52-0230',
+                      '2018-08-19T17:41:52+0000'):
+            self.assertEqual(
+                parse_timestamp(value),
+                datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z'))
+
+    def test_isoformat_roundtrip(self):
+        zone = timezone(timedelta(hours=3))
+        for value in (datetime(2019, 1, 28, 10, 12, 43),
+                      datetime(2019, 1, 28, 10, 12, 43, 120000),
+                      datetime(2019, 1, 28, 10, 12, 43, 5, zone)):
+            self.assertEqual(parse_timestamp(value.isoformat()), value)
+
+
+class RecordTest(unittest.TestCase):
+
+    def test_dump_load(self):
+        record = Record(
+            uniq='q1w2e3r4t5y6', name='John Doe', title='Proctologist',
+            published=parse_timestamp('2018-08-19T17:41:52+0300'),
+            link='https://hh.ru/resume/q1w2e3r4t5y6')
+        self.assertEqual(Record.load(record.dump()), record)
+        self.assertEqual(record.dump()[3], '2018-08-19T17:41:52+03:00')
+
+    def test_compact(self):
+        record = Record('uniq', 'name', 'title', None, 'link', True)
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertEqual(record.asdict()['enabled'], True)
+
+
+class Slow(BaseProvider):
+
+    def __init__(self, **kwargs):
+        super().__init__(
+            name='slow', redirect_uri='', client_id='id',
+            client_secret='secret', **kwargs)
+        self.calls = 0
+
+    def fetch(self, token):
+        self.calls += 1
+        sleep(0.2)
+        if token == 'bad':
+            raise ResumeError('403 bad_authorization', 403)
+        return [Record(token, 'name', 'title', datetime(2019, 1, 28), 'link')]
+
+    def push(self, token, resume):
+        self.calls += 1
+        sleep(0.2)
+        return 204
+
+
+def concurrently(*calls):
+    results = [None] * len(calls)
+
+    def run(i, call):
+        try:
+            results[i] = call()
+        except Exception as e:
+            results[i] = e
+
+    threads = [Thread(target=run, args=(i, call))
+               for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class CoalesceTest(unittest.TestCase):
+
+    def test_in_process(self):
+        provider = Slow()
+        results = concurrently(*[lambda: provider.fetch('t')] * 5)
+        self.assertEqual(provider.calls, 1)
+        self.assertTrue(all(result == results[0] for result in results))
+        self.assertEqual(results[0][0].uniq, 't')
+
+        provider.fetch('t')
+        self.assertEqual(provider.calls, 2)  # nothing in flight, no reuse
+
+    def test_errors_are_shared(self):
+        provider = Slow()
+        results = concurrently(*[lambda: provider.fetch('bad')] * 3)
+        self.assertEqual(provider.calls, 1)
+        self.assertTrue(all(isinstance(e, ResumeError) for e in results))
+
+    def test_distinct_calls(self):
+        provider = Slow()
+        concurrently(lambda: provider.fetch('a'), lambda: provider.fetch('b'))
+        self.assertEqual(provider.calls, 2)
+
+    @unittest.skipIf(fakeredis is None, 'fakeredis required')
+    def test_across_processes(self):
+        redis = fakeredis.FakeRedis()
+        one, two = (Slow(cache=redis, coalesce_ttl=5) for _ in range(2))
+        results = concurrently(
+            lambda: one.fetch('bad'), lambda: two.fetch('bad'),
+            lambda: one.fetch('t'),
+            lambda: (sleep(0.05), two.fetch('t'))[1])
+        self.assertEqual(one.calls + two.calls, 2)
+        self.assertIsInstance(results[1], ResumeError)
+        self.assertEqual(results[1].status, 403)
+        self.assertEqual(results[2], results[3])
+
+    @unittest.skipIf(fakeredis is None, 'fakeredis required')
+    def test_push_in_process_only(self):
+        provider = Slow(cache=fakeredis.FakeRedis(), coalesce_ttl=5)
+        with mock.patch.object(provider, '_shared') as shared:
+            results = concurrently(
+                *[lambda: provider.push('t', resume='r')] * 3)
+        shared.assert_not_called()
+        self.assertEqual(provider.calls, 1)
+        self.assertEqual(results, [204] * 3)
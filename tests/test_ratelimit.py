@@ -0,0 +1,58 @@
+import unittest
+from unittest import mock
+from datetime import timedelta
+
+from flask_jwt_extended import create_access_token
+
+from tests import AppBase
+
+from app import create_app, utils
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, 'fakeredis required')
+class RateLimitTest(AppBase):
+
+    def setUp(self):
+        import config
+        config.FRONTEND_URL = config.FRONTEND_URL or 'http://localhost'
+        app = create_app()
+        super().setUp(app)  # reloads config, expiry must be timedelta again
+        app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=15)
+        app.config['RATELIMIT_IP_SHARE'] = 2
+        app.redis = fakeredis.FakeRedis()
+
+    def throttle(self, identity, address='10.0.0.1'):
+        environ = {'REMOTE_ADDR': address}
+        with self.app.test_request_context('/', environ_base=environ), \
+                mock.patch.object(
+                    utils, 'get_jwt_identity', return_value=identity):
+            return utils.throttle('scope', 2, 60)
+
+    def test_per_identity(self):
+        self.assertEqual([self.throttle(1) for _ in range(3)], [0, 0, 60])
+        self.assertEqual(self.throttle(2), 0)
+
+    def test_per_ip_across_identities(self):
+        results = [self.throttle(identity) for identity in range(5)]
+        self.assertEqual(results, [0, 0, 0, 0, 60])
+        self.assertEqual(self.throttle(5, address='10.0.0.2'), 0)
+
+    def test_anonymous_per_ip(self):
+        results = [self.throttle(None) for _ in range(5)]
+        self.assertEqual(results, [0, 0, 0, 0, 60])
+
+    def test_revalidations_are_free(self):
+        token = create_access_token(identity=1)
+        headers = {
+            'Authorization': f'JWT {token}',
+            'If-None-Match': f'"{utils.resume_version(1)}"'}
+        client = self.app.test_client()
+        limit, _ = self.app.config['RATELIMIT_RESUME']
+        for _ in range(limit + 5):
+            rv = client.get('/resume', headers=headers)
+            self.assertEqual(rv.status_code, 304)
@@ -0,0 +1,88 @@
+import logging
+import unittest
+from time import time
+from unittest import mock
+
+from redis import RedisError
+
+from app.revocation import BloomFilter, Revocations
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class BloomFilterTest(unittest.TestCase):
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        items = [f'jti-{i}' for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(1000, error=0.01)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        hits = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(hits / 10000, 0.03)
+
+    def test_empty(self):
+        self.assertNotIn('jti', BloomFilter(10))
+
+
+@unittest.skipIf(fakeredis is None, 'fakeredis required')
+class RevocationsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+
+    def revocations(self, capacity=100):
+        return Revocations(
+            self.redis, capacity, refresh=0, logger=logging.getLogger())
+
+    def test_revoked_everywhere(self):
+        here, there = self.revocations(), self.revocations()
+        self.assertNotIn('jti', there)
+        here.revoke('jti', time() + 60)
+        self.assertIn('jti', here)
+        self.assertIn('jti', there)
+        self.assertNotIn('other', there)
+
+    def test_catches_up_without_rebuild(self):
+        here, there = self.revocations(), self.revocations()
+        self.assertNotIn('one', there)
+        with mock.patch.object(there, '_rebuild') as rebuild:
+            for i in range(3):
+                here.revoke(f'jti-{i}', time() + 60)
+            self.assertTrue(all(f'jti-{i}' in there for i in range(3)))
+        rebuild.assert_not_called()
+        self.assertEqual(there.version, 3)
+
+    def test_rebuilds_after_gap(self):
+        here, there = self.revocations(), self.revocations()
+        self.assertNotIn('jti-0', there)
+        with mock.patch.object(Revocations, 'log', 2):
+            for i in range(5):
+                here.revoke(f'jti-{i}', time() + 60)
+        spy = mock.patch.object(
+            there, '_rebuild', wraps=there._rebuild)
+        with spy as rebuild:
+            self.assertIn('jti-0', there)
+        rebuild.assert_called_once_with(5)
+
+    def test_expired(self):
+        revocations = self.revocations()
+        revocations.revoke('old', time() - 1)
+        self.assertNotIn('old', revocations)
+        self.assertNotIn('old', self.revocations())
+        self.assertIsNone(self.redis.zscore(Revocations.key, 'old'))
+
+    def test_fails_open(self):
+        revocations = self.revocations()
+        revocations.revoke('jti', time() + 60)
+        with mock.patch.object(
+                self.redis, 'get', side_effect=RedisError('down')):
+            self.assertNotIn('jti', revocations)
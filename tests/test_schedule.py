@@ -0,0 +1,42 @@
+import unittest
+
+try:
+    import celery
+    import fakeredis
+except ImportError:
+    celery = fakeredis = None
+
+
+@unittest.skipIf(celery is None or fakeredis is None,
+                 'celery and fakeredis required')
+class ScheduleTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        import config
+        config.SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        config.FRONTEND_URL = config.FRONTEND_URL or 'http://localhost'
+        from benchmarks.schedule import simulate
+        cls.simulate = staticmethod(simulate)
+
+    def test_push_every_period(self):
+        report = self.simulate(60, days=0.25, latency='fixed:0.1')
+        self.assertEqual(report['runs']['push']['count'], 11)  # 6h / 30m
+        self.assertEqual(report['runs']['push']['skipped'], 0)
+        self.assertEqual(report['push_latency']['p50'], 1800)
+        self.assertEqual(report['provider_calls']['methods']['push'],
+                         11 * report['scale']['resumes'] // 2)
+
+    def test_spread_flattens_bursts(self):
+        burst = self.simulate(60, days=0.25, latency='fixed:0.1')
+        spread = self.simulate(
+            60, days=0.25, latency='fixed:0.1', config={'PUSH_SPREAD': True})
+        self.assertIn('push_slice', spread['runs'])
+        self.assertLess(spread['provider_calls']['per_minute_max'],
+                        burst['provider_calls']['per_minute_max'])
+
+    def test_overlapping_runs_are_skipped(self):
+        report = self.simulate(
+            60, days=0.25, latency='fixed:60', config={'PUSH_PERIOD': 600})
+        self.assertGreater(report['runs']['push']['skipped'], 0)
+        self.assertEqual(report['peak_concurrency'], 2)
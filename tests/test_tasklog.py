@@ -0,0 +1,40 @@
+from logging import getLogger
+
+from tests import AppBase
+
+from app.providers import PushError
+from app import tasklog
+from app.tasklog import RunLog
+
+
+class RunLogTest(AppBase):
+
+    def setUp(self):
+        super().setUp()
+        self.logger = getLogger('tests.tasklog')
+        tasklog._logged.clear()
+
+    def test_sampled(self):
+        self.app.config.update(TASK_LOG='sampled', TASK_LOG_SAMPLE=0)
+        with self.assertLogs(self.logger, 'INFO') as logs:
+            log = RunLog(self.logger, 'Push')
+            for i in range(10):
+                log.success(f'resume-{i}', 'headhunter', 204)
+            for i in range(3):
+                log.failure(f'resume-{i}', 'superjob', PushError('x', 503))
+            log.summary()
+
+        failed = [line for line in logs.output if 'failed' in line]
+        self.assertEqual(len(failed), 1)
+        self.assertNotIn('success', ' '.join(logs.output))
+        self.assertIn('total=13 headhunter.204=10 superjob.503=3 '
+                      'suppressed=2', logs.output[-1])
+
+    def test_full(self):
+        self.app.config.update(TASK_LOG='full')
+        with self.assertLogs(self.logger, 'INFO') as logs:
+            log = RunLog(self.logger, 'Reauth')
+            for i in range(3):
+                log.failure(f'user-{i}', 'superjob', PushError('x', 400))
+                log.success(f'user-{i}', 'superjob', 200)
+        self.assertEqual(len(logs.output), 6)
@@ -0,0 +1,113 @@
+import unittest
+from datetime import datetime
+
+try:
+    import celery
+    import fakeredis
+except ImportError:
+    celery = fakeredis = None
+
+
+@unittest.skipIf(celery is None or fakeredis is None,
+                 'celery and fakeredis required')
+class TasksBase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        import config
+        config.SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        config.FRONTEND_URL = config.FRONTEND_URL or 'http://localhost'
+        from app import tasks
+        cls.tasks = tasks
+
+    def setUp(self):
+        from app import db
+        self.app = self.tasks.current_app
+        self.app.redis = fakeredis.FakeRedis()
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        self.fixtures()
+
+    def fixtures(self):
+        from app import db
+        from app.models import User, Resume
+        self.user = User(
+            uniq='user', provider='superjob', access='a', refresh='r',
+            expires=datetime.utcnow())
+        self.resume = Resume(uniq='resume', enabled=True, owner=self.user)
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        from app import db
+        db.session.remove()
+        db.drop_all()
+
+
+class BackoffTest(TasksBase):
+
+    def test_entity_errors_back_off(self):
+        from app.providers import PushError
+        self.tasks.backoff(self.resume, PushError('not found', 404))
+        self.assertEqual(self.resume.failures, 1)
+
+    def test_transient_errors_do_not(self):
+        from app.providers import PushError, TokenError
+        for error in (PushError('throttled', 429), PushError('down', 503),
+                      PushError('ConnectionError: refused')):
+            self.tasks.backoff(self.resume, error)
+        self.tasks.backoff(self.user, TokenError('down', 502))
+        self.assertEqual(self.resume.failures, 0)
+        self.assertEqual(self.user.failures, 0)
+        self.assertFalse(self.user.quarantined)
+
+
+class PushSliceTest(TasksBase):
+
+    def run_at(self, moment):
+        from unittest import mock
+        with mock.patch.object(self.tasks, 'time', lambda: moment), \
+                mock.patch.object(self.tasks, 'dispatch') as dispatch:
+            self.tasks.push_slice()
+        return [call[0] for call in dispatch.call_args_list]
+
+    def test_late_tick_catches_up(self):
+        from app.models import SLOTS
+        width = self.app.config['PUSH_PERIOD'] / self.app.config['PUSH_SLICES']
+        step = SLOTS // self.app.config['PUSH_SLICES']
+        self.assertEqual(self.run_at(width * 3), [(step * 3, step * 4)])
+        self.assertEqual(self.run_at(width * 5), [
+            (step * 4, step * 5), (step * 5, step * 6)])
+        self.assertEqual(self.run_at(width * 5.5), [])
+        self.assertEqual(self.run_at(width * 6), [(step * 6, step * 7)])
+
+
+class PartitionTest(TasksBase):
+
+    def test_stale_owner_reroutes(self):
+        from unittest import mock
+        self.tasks.membership('alive').lease(3).acquire()
+        with mock.patch.dict(self.app.config, {'PARTITIONS': 4}), \
+                mock.patch.object(self.tasks, 'push_owned') as owned, \
+                mock.patch.object(self.tasks, 'send_partition') as send:
+            self.tasks.push_partition(3, 0, 10, node='dead')
+            self.tasks.push_partition(3, 0, 10, node='alive')
+        send.assert_called_once_with(3, 0, 10, 'alive')
+        owned.assert_called_once_with(3, 0, 10)
+
+
+class KeysetTest(TasksBase):
+
+    def test_slow_rows_renew_lease(self):
+        from unittest import mock
+        from app.locks import Checkpoint
+        from app.models import Resume
+        run = Checkpoint(self.app.redis, 'test', 90, 600)
+        self.assertTrue(run.start())
+        clock = iter(range(0, 1000, 40))
+        with mock.patch.object(self.tasks, 'monotonic', lambda: next(clock)), \
+                mock.patch.object(run, 'renew', wraps=run.renew) as renew:
+            rows = list(self.tasks.keyset(run, Resume.query, Resume.id))
+        self.assertEqual(rows, [self.resume])
+        renew.assert_called_once_with()
@@ -0,0 +1,63 @@
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+
+from flask import g
+from flask_jwt_extended import create_access_token
+
+from tests import AppBase
+
+from app import create_app, db, timing
+from app.fake import Latency, FakeProvider
+from app.models import User
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, 'fakeredis required')
+class TimingTest(AppBase):
+
+    def setUp(self):
+        import config
+        config.FRONTEND_URL = config.FRONTEND_URL or 'http://localhost'
+        with mock.patch.object(config, 'SERVER_TIMING', True):
+            app = create_app()
+        super().setUp(app)  # reloads config, expiry must be timedelta again
+        app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=15)
+        app.redis = timing.TimedRedis(
+            connection_pool=fakeredis.FakeRedis().connection_pool)
+        app.providers = {'superjob': FakeProvider(
+            'superjob', Latency.parse('fixed:0.01'), strict=False)}
+        self.user = User(
+            uniq='user', provider='superjob', access='access-1-0',
+            refresh='refresh-1-0',
+            expires=datetime.utcnow() + timedelta(days=1))
+        db.session.add(self.user)
+        db.session.commit()
+
+    def test_header(self):
+        token = create_access_token(identity=self.user.id)
+        rv = self.app.test_client().get(
+            '/resume', headers={'Authorization': f'JWT {token}'})
+        self.assertEqual(rv.status_code, 200)
+        entries = dict(
+            entry.split(';dur=')
+            for entry in rv.headers['Server-Timing'].split(', '))
+        self.assertEqual(
+            sorted(entries), ['db', 'provider', 'redis', 'total'])
+        self.assertGreaterEqual(float(entries['provider']), 10)
+        self.assertGreaterEqual(
+            float(entries['total']), float(entries['provider']))
+
+    def test_pipelines(self):
+        with self.app.test_request_context('/'):
+            timing.start_request()
+            pipe = self.app.redis.pipeline()
+            pipe.incr('counter')
+            pipe.expire('counter', 60)
+            with mock.patch.object(timing, 'monotonic', side_effect=[0, 2]):
+                pipe.execute()
+            self.assertEqual(g.timings['redis'], 2)